@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from . import database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,11 +45,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # For serving static files in production
+    'ourproject.middleware.StaticFilesMiddleware',  # WhiteNoise static files, async-capable for ASGI
+    'ourproject.middleware.RequestTimingMiddleware',  # Server-Timing header and /metrics
+    'ourproject.ratelimit.ConcurrencyLimitMiddleware',  # 503 before the session/database when a worker is saturated
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'ourproject.middleware.ProfilerMiddleware',  # ?profile for superusers, optional sampling
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,13 +81,79 @@ WSGI_APPLICATION = 'Gproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite in db.sqlite3 unless DATABASE_URL says otherwise; see Gproject/database.py.
 DATABASES = {
+    'default': database.config(default_sqlite_path=BASE_DIR / 'db.sqlite3'),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local-memory by default. Point CACHE_BACKEND/CACHE_LOCATION at a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) so every gunicorn worker sees the same entries.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'smart-eats'),
     }
 }
 
+# Seconds the navbar "received orders" flag may be served from cache. Order signals
+# refresh it immediately in the worker that saved the order; the timeout bounds how
+# stale other workers can be when the cache is per-process.
+RECEPTION_FLAG_TIMEOUT = int(os.environ.get('RECEPTION_FLAG_TIMEOUT', 60))
+# The menu catalog and its template fragments are keyed by a version that every
+# MenuItem change bumps, so this only bounds how long retired versions linger.
+MENU_CACHE_TIMEOUT = int(os.environ.get('MENU_CACHE_TIMEOUT', 60 * 60 * 24))
+# A MenuItem change bumps the version only in the cache of the worker that saved it. With
+# a per-process cache the version expires after this many seconds, which bounds how long
+# other workers show (and charge) old prices; a shared cache keeps it until the next bump.
+MENU_VERSION_TIMEOUT = int(os.environ.get('MENU_VERSION_TIMEOUT', 10))
+# index, menu and aboutus are cached whole (ourproject/pagecache.py), keyed by the menu
+# version and reception flag; 0 turns the page cache off.
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 60 * 10))
+
+
+# Request metrics exposed at /metrics (Prometheus text format).
+# Each worker keeps its own totals and writes them to METRICS_MULTIPROC_DIR, so a scrape
+# sees the sum over every worker. gunicorn.conf.py empties it when the server starts, and
+# uses a temporary directory when it is unset; empty here (runserver) means this process only.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+# Lets a Prometheus scraper authenticate with "Authorization: Bearer <token>"; superusers can always read it.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Live order events (Server-Sent Events at /api/orders/events/).
+# LocalBus only reaches pages connected to the same process; with several workers use
+# ourproject.live.SQLiteBus, which shares events through LIVE_BUS_PATH on this host.
+LIVE_EVENT_BUS = os.environ.get('LIVE_EVENT_BUS', 'ourproject.live.LocalBus')
+LIVE_BUS_PATH = os.environ.get('LIVE_BUS_PATH', os.path.join(BASE_DIR, 'live_events.sqlite3'))
+LIVE_BUS_RETENTION = int(os.environ.get('LIVE_BUS_RETENTION', 300))  # seconds of events kept in the file
+LIVE_POLL_INTERVAL = float(os.environ.get('LIVE_POLL_INTERVAL', 0.5))
+LIVE_HEARTBEAT = int(os.environ.get('LIVE_HEARTBEAT', 15))
+LIVE_STREAM_MAX_AGE = int(os.environ.get('LIVE_STREAM_MAX_AGE', 300))  # browsers reconnect and resume
+LIVE_BACKLOG = int(os.environ.get('LIVE_BACKLOG', 256))
+
+# Order change feed at /api/orders/feed/ for superusers or "Authorization: Bearer <ORDER_FEED_TOKEN>".
+ORDER_FEED_TOKEN = os.environ.get('ORDER_FEED_TOKEN', '')
+ORDER_FEED_PAGE_SIZE = int(os.environ.get('ORDER_FEED_PAGE_SIZE', 100))
+ORDER_FEED_MAX_PAGE_SIZE = 500
+# Changes younger than this (seconds) wait for the next poll, so late commits can't slip behind a cursor.
+ORDER_FEED_SETTLE = float(os.environ.get('ORDER_FEED_SETTLE', 1))
+# Tombstones for deleted orders are kept this many seconds, so a client must poll within
+# that window; an older cursor gets 410 and starts again without one. Each worker deletes
+# expired tombstones at most once per ORDER_FEED_PURGE_INTERVAL after an order is deleted.
+ORDER_FEED_RETENTION = int(os.environ.get('ORDER_FEED_RETENTION', 60 * 60 * 24 * 30))
+ORDER_FEED_PURGE_INTERVAL = int(os.environ.get('ORDER_FEED_PURGE_INTERVAL', 60 * 60))
+
+# Request profiler: superusers can add ?profile (or ?profile=prof) to any URL.
+# PROFILER_SAMPLE_RATE=N also profiles 1 in N requests into PROFILER_DIR (0 disables),
+# keeping the newest PROFILER_KEEP files.
+PROFILER_SAMPLE_RATE = int(os.environ.get('PROFILER_SAMPLE_RATE', 0))
+PROFILER_DIR = os.environ.get('PROFILER_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILER_KEEP = int(os.environ.get('PROFILER_KEEP', 200))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -122,8 +193,17 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'ourproject', 'static')]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-# WhiteNoise configuration for static files
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# In production collectstatic bundles and minifies the CSS/JS, fingerprints every file and
+# writes Brotli and gzip copies (see ourproject/storage.py); WhiteNoise serves the
+# fingerprinted names with far-future immutable cache headers. With DEBUG the source
+# files are served as they are, without collectstatic.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+        else 'ourproject.storage.BundledStaticFilesStorage',
+    },
+}
 
 # Media files (user uploads)
 MEDIA_URL = '/media/'
@@ -142,6 +222,42 @@ ADMIN_SIGNUP_CODE = '2025'
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 30  # 30 days
 
+# SESSION_MODE picks where sessions live:
+#   cached_db       (default) django_session rows, read through the cache so most requests
+#                   skip the session query; cached copies expire after SESSION_CACHE_TIMEOUT
+#                   seconds, which bounds how long a logout takes to reach other workers
+#   db              django_session rows, read on every request
+#   signed_cookies  the session is the signed (not encrypted) cookie itself; no storage,
+#                   but a session can't be revoked before it expires, only forgotten by the browser
+SESSION_ENGINES = {
+    'cached_db': 'ourproject.sessions',
+    'db': 'django.contrib.sessions.backends.db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db')
+if SESSION_MODE not in SESSION_ENGINES:
+    raise ValueError(f'SESSION_MODE must be one of {", ".join(SESSION_ENGINES)}, not {SESSION_MODE!r}')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+SESSION_CACHE_TIMEOUT = int(os.environ.get('SESSION_CACHE_TIMEOUT', 60 * 5))
+# Seconds between purges of expired sessions by each worker (ourproject/sessions.py);
+# 0 (the default) leaves it to `manage.py purge_sessions` from cron.
+SESSION_PURGE_INTERVAL = int(os.environ.get('SESSION_PURGE_INTERVAL', 0))
+
+# place_order remembers each Idempotency-Key (and the response it got) for at least this
+# many seconds; each worker deletes older keys at most once per IDEMPOTENCY_PURGE_INTERVAL.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.environ.get('IDEMPOTENCY_PURGE_INTERVAL', 60 * 10))
+
+# Rate limits (@ratelimit in ourproject/views.py) and load shedding (ourproject/ratelimit.py).
+RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'True') == 'True'
+# Behind N proxies that each append to X-Forwarded-For, the client is the Nth entry from the
+# end; 0 uses REMOTE_ADDR. Render runs one proxy in front of the app.
+RATELIMIT_PROXY_COUNT = int(os.environ.get('RATELIMIT_PROXY_COUNT', 0))
+# Requests (and writes) one worker handles at once before answering 503; 0 is no limit.
+# Sync gunicorn workers take one request at a time anyway; this matters under SERVER_MODE=asgi.
+CONCURRENCY_LIMIT = int(os.environ.get('CONCURRENCY_LIMIT', 64))
+CONCURRENCY_LIMIT_WRITES = int(os.environ.get('CONCURRENCY_LIMIT_WRITES', 8))
+
 # Authentication redirects
 # Use our custom login view at '/login/' instead of the default '/accounts/login/'
 LOGIN_URL = '/login/'
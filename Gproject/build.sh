@@ -4,6 +4,9 @@ set -e
 echo "Installing dependencies..."
 pip install -r requirements.txt
 
+echo "Building image renditions..."
+python manage.py build_images --static
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
 
@@ -0,0 +1,46 @@
+"""gunicorn settings, read automatically when gunicorn starts in this directory.
+
+SERVER_MODE picks how the app is served:
+
+    wsgi  (default) Gproject.wsgi on gunicorn's sync workers, one request per worker at a time
+    asgi  Gproject.asgi on uvicorn workers; async views (place_order, qr_payment, the status
+          APIs, the live event stream) wait on the database without holding the worker
+
+The number of workers comes from WEB_CONCURRENCY and the port from PORT, as usual.
+
+/metrics sums the totals every worker writes to METRICS_MULTIPROC_DIR (see
+ourproject/metrics.py). Without one set, each server gets a fresh temporary directory,
+removed when it stops; a configured one is emptied when the server starts.
+"""
+import glob
+import os
+import shutil
+import tempfile
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi').lower()
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'Gproject.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+elif SERVER_MODE == 'wsgi':
+    wsgi_app = 'Gproject.wsgi:application'
+else:
+    raise RuntimeError(f'SERVER_MODE must be "wsgi" or "asgi", not {SERVER_MODE!r}')
+
+# Set before the workers fork, so Django's settings in every worker read the same directory.
+TEMPORARY_METRICS_DIR = not os.environ.get('METRICS_MULTIPROC_DIR')
+if TEMPORARY_METRICS_DIR:
+    os.environ['METRICS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='smarteats-metrics-')
+
+
+def on_starting(server):
+    # A previous server's workers are gone; their totals would otherwise be summed forever.
+    directory = os.environ['METRICS_MULTIPROC_DIR']
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        os.unlink(path)
+
+
+def on_exit(server):
+    if TEMPORARY_METRICS_DIR:
+        shutil.rmtree(os.environ['METRICS_MULTIPROC_DIR'], ignore_errors=True)
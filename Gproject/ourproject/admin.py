@@ -1,7 +1,49 @@
 from django.contrib import admin
-from .models import Profile, Order, MenuItem
+from . import sales
+from .models import Profile, Order, OrderArchive, OrderLine, OrderTombstone, MenuItem
+
+
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    raw_id_fields = ('menu_item',)
+
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'payment_status', 'total', 'created_at')
+    list_select_related = ('user',)
+    inlines = [OrderLineInline]
+
+    # The admin saves the order, then its lines, in one transaction. Edits to the status,
+    # payment method, total or lines move the order in the sales rollup, so it is taken out
+    # as it was read here and counted again once the lines are saved.
+    def save_model(self, request, obj, form, change):
+        form.sales_before = sales.snapshots(Order.objects.filter(pk=obj.pk).select_for_update()) if change else []
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        deltas = {}
+        for snap in form.sales_before:
+            sales.contribute(deltas, snap, -1)
+        for snap in sales.snapshots(Order.objects.filter(pk=form.instance.pk)):
+            sales.contribute(deltas, snap)
+        sales.upsert(deltas)
+
+
+@admin.register(OrderArchive)
+class OrderArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'status', 'payment_status', 'total', 'created_at', 'archived_at')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(OrderTombstone)
+class OrderTombstoneAdmin(admin.ModelAdmin):
+    list_display = ('order_id', 'deleted_at')
+
 
 # Register your models here.
 admin.site.register(Profile)
-admin.site.register(Order)
 admin.site.register(MenuItem)
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class OurprojectConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ourproject'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.backends.signals import connection_created
+
+        from Gproject.database import apply_sqlite_pragmas
+
+        from . import signals  # noqa: F401
+        from .metrics import install_query_timer
+        from .sessions import schedule as schedule_session_purge
+
+        connection_created.connect(apply_sqlite_pragmas)
+        connection_created.connect(install_query_timer)
+        request_finished.connect(schedule_session_purge)
@@ -0,0 +1,80 @@
+"""Moving finished orders out of the hot Order table, and reading a customer's history back.
+
+``archive_batch`` copies a batch of finished orders into OrderArchive (their lines
+inlined as JSON) and deletes them from Order and OrderLine, all in one short transaction,
+so other writers only ever wait for one batch. The rows are deleted with plain SQL rather
+than ``QuerySet.delete()``: archived orders stay counted in the sales rollup, which the
+per-order delete signals would take them out of. The same transaction writes their
+tombstones, so order feed clients drop them, and one ``orders_changed`` is sent for the
+batch, which refreshes the reception flag and the live pages.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+
+from . import feed
+from .models import Order, OrderArchive, OrderLine, OrderTombstone
+from .signals import orders_changed
+
+# Received orders that are still unpaid stay hot: the reception lists them for payment.
+FINISHED = Q(status='cancelled') | Q(status='received', payment_status='paid')
+
+
+def candidates(cutoff):
+    """Finished orders last changed before ``cutoff``."""
+    return Order.objects.filter(FINISHED, updated_at__lt=cutoff)
+
+
+def to_archive(order):
+    return OrderArchive(
+        id=order.pk,
+        user_id=order.user_id,
+        total=order.total,
+        status=order.status,
+        payment_method=order.payment_method,
+        payment_status=order.payment_status,
+        transaction_ref=order.transaction_ref,
+        created_at=order.created_at,
+        updated_at=order.updated_at,
+        lines=[{'menu_item_id': line.menu_item_id, 'title': line.title, 'unit_price': str(line.unit_price), 'qty': line.qty}
+               for line in order.lines.all()],
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """Archive up to ``batch_size`` candidates; return how many were moved."""
+    with transaction.atomic():
+        # Re-checked inside the transaction, so an order changed meanwhile is skipped.
+        orders = list(candidates(cutoff).prefetch_related('lines')[:batch_size])
+        if not orders:
+            return 0
+        ids = [order.pk for order in orders]
+        OrderArchive.objects.bulk_create([to_archive(order) for order in orders])
+        delete_orders(ids)
+        OrderTombstone.objects.bulk_create([OrderTombstone(order_id=pk) for pk in ids])
+        orders_changed.send(sender=Order, ids=ids, changes={})
+        transaction.on_commit(feed.purge_if_due)
+    return len(ids)
+
+
+def delete_orders(ids):
+    """Delete the orders ``ids`` and their lines without the per-order delete signals."""
+    quote = connection.ops.quote_name
+    # Batches stay under SQLite's limit on query parameters.
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), 900):
+            batch = ids[start:start + 900]
+            marks = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {quote(OrderLine._meta.db_table)} WHERE order_id IN ({marks})', batch)
+            cursor.execute(f'DELETE FROM {quote(Order._meta.db_table)} WHERE id IN ({marks})', batch)
+
+
+def customer_history(user, limit):
+    """A customer's latest ``limit`` orders from both the hot table and the archive."""
+    hot = list(Order.objects.filter(user=user).order_by('-created_at')[:limit])
+    if len(hot) == limit:
+        oldest = hot[-1].created_at
+        archived = OrderArchive.objects.filter(user=user, created_at__gt=oldest)
+    else:
+        archived = OrderArchive.objects.filter(user=user)
+    archived = list(archived.order_by('-created_at')[:limit])
+    return sorted(hot + archived, key=lambda order: order.created_at, reverse=True)[:limit]
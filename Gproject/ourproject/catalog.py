@@ -0,0 +1,137 @@
+"""The menu as shown on the menu and order pages, cached under a version number.
+
+Any MenuItem save or delete bumps the version (see signals.py), which retires both the
+cached catalog and every template fragment keyed on it, so a price change shows up on
+every page at once without tracking which keys to delete. A per-process cache only sees
+bumps made in its own worker, so there the version also expires after
+MENU_VERSION_TIMEOUT seconds and the other workers move to a fresh one.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from . import images
+from .models import MenuItem
+
+VERSION_KEY = 'menu:version'
+CATALOG_KEY = 'menu:catalog:{}'
+PRICES_KEY = 'menu:prices:{}'
+
+# Static images for the original dishes; uploaded MenuItem.image files take precedence.
+DEFAULT_IMAGES = {
+    'Ema Datshi': 'emadatsi.jpg',
+    'Fried Momo': 'fried momo.avif',
+    'Sikam Datshi': 'sikam datsi.jpg',
+    'Kewa Datshi': 'kewa datsi.png',
+    'Vegetable Curry': 'vegetablecurry.jpg',
+    'Chicken Fried Rice': 'chicken.jpg',
+    'Spicy Noodles': 'spicy.jpg',
+    'Seasonal Salad': 'salad.jpg',
+}
+
+# This process's copy of the price index, reused until the menu version moves on.
+_prices = (None, None)  # (version, PriceIndex)
+
+
+def version_timeout():
+    if isinstance(caches['default'], LocMemCache):
+        return settings.MENU_VERSION_TIMEOUT
+    return None
+
+
+def version():
+    current = cache.get(VERSION_KEY)
+    if current is None:
+        # Start from the clock, not 1, so a restarted, evicted or expired counter can
+        # never land on a version whose old catalog is still cached.
+        cache.add(VERSION_KEY, time.time_ns(), version_timeout())
+        current = cache.get(VERSION_KEY)
+    return current
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), version_timeout())
+
+
+def picture(item):
+    """The item's image as ``{% picture %}`` data: src, srcset, sources, width, height.
+
+    None for an item with neither an upload nor a default image; the card shows no picture.
+    """
+    if item.image:
+        return images.for_field(item.image, item.image_renditions)
+    if item.name in DEFAULT_IMAGES:
+        return images.for_static('images/' + DEFAULT_IMAGES[item.name])
+    return None
+
+
+def build():
+    return [
+        {
+            'id': item.pk,
+            'name': item.name,
+            'description': item.description,
+            'price': item.price,
+            'picture': picture(item),
+        }
+        for item in MenuItem.objects.filter(available=True).order_by('id')
+    ]
+
+
+def get_catalog():
+    """Return the available menu items as a list of dicts, from the cache when possible."""
+    key = CATALOG_KEY.format(version())
+    items = cache.get(key)
+    if items is None:
+        items = build()
+        cache.set(key, items, settings.MENU_CACHE_TIMEOUT)
+    return items
+
+
+class PriceIndex:
+    """Every MenuItem's id, name, price and availability, looked up by id or by name."""
+
+    def __init__(self, rows):
+        self.by_id = {}
+        self.by_name = {}
+        # Available rows first, so a duplicate name resolves to one that can be ordered.
+        for row in sorted(rows, key=lambda row: (not row[3], row[0])):
+            self.by_id[row[0]] = row
+            self.by_name.setdefault(row[1], row)
+
+    def lookup(self, menu_id=None, name=None):
+        """Return (id, name, price, available), or None for an unknown item."""
+        if menu_id is not None:
+            return self.by_id.get(menu_id)
+        return self.by_name.get(name)
+
+
+def price_index():
+    """Return the PriceIndex for the current menu version: in memory, else cache, else one query."""
+    global _prices
+    current = version()
+    cached_version, index = _prices
+    if cached_version == current:
+        return index
+    key = PRICES_KEY.format(current)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(MenuItem.objects.values_list('id', 'name', 'price', 'available'))
+        cache.set(key, rows, settings.MENU_CACHE_TIMEOUT)
+    index = PriceIndex(rows)
+    _prices = (current, index)
+    return index
+
+
+async def aprice_index():
+    """price_index() for async views; no thread hop while this process's copy is current."""
+    cached_version, index = _prices
+    if cached_version is not None and cached_version == await cache.aget(VERSION_KEY):
+        return index
+    return await sync_to_async(price_index)()
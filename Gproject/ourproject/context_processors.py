@@ -1,8 +1,21 @@
+from django.conf import settings
+from django.core.cache import cache
+
 from .models import Order
 
+RECEPTION_FLAG_KEY = 'reception:has_received'
+
+
+def invalidate_reception_flag():
+    cache.delete(RECEPTION_FLAG_KEY)
+
+
 def reception_flag(request):
-    try:
-        has_received = Order.objects.filter(status='received').exists()
-    except Exception:
-        has_received = False
+    has_received = cache.get(RECEPTION_FLAG_KEY)
+    if has_received is None:
+        try:
+            has_received = Order.objects.filter(status='received').exists()
+        except Exception:
+            return {'reception_has_received': False}
+        cache.set(RECEPTION_FLAG_KEY, has_received, settings.RECEPTION_FLAG_TIMEOUT)
     return {'reception_has_received': has_received}
@@ -0,0 +1,160 @@
+"""Streaming order exports (CSV or NDJSON) for accounting.
+
+Orders and archived orders are read with ``QuerySet.iterator(chunk_size=...)`` in
+``created_at`` order, merged into one stream and written out a batch of rows at a time,
+so memory stays flat however many orders match and the header goes out before the first
+query runs. Used by the ``order_export`` view and ``manage.py export_orders``.
+"""
+import csv
+import heapq
+import json
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Order, OrderArchive, OrderLine
+
+FORMATS = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+COLUMNS = ('id', 'created_at', 'user', 'status', 'payment_status', 'payment_method', 'transaction_ref', 'total', 'items', 'archived')
+FIELDS = ('id', 'created_at', 'status', 'payment_status', 'payment_method', 'transaction_ref', 'total')
+FILTERS = ('since', 'until', 'status', 'payment_status', 'user')
+CHUNK_SIZE = 2000
+# Rows per chunk of output: big enough to keep writes cheap, small enough to start at once.
+ROWS_PER_WRITE = 200
+# Spreadsheets run a cell starting with one of these as a formula; see _cell().
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _day_start(value):
+    return timezone.make_aware(datetime.combine(date.fromisoformat(value), time.min))
+
+
+def parse_filters(params):
+    """Model filter kwargs from ``since``/``until`` (YYYY-MM-DD, inclusive), ``status``,
+    ``payment_status`` and ``user`` (a username); ValueError if one is invalid."""
+    filters = {}
+    try:
+        if params.get('since'):
+            filters['created_at__gte'] = _day_start(params['since'])
+        if params.get('until'):
+            filters['created_at__lt'] = _day_start(params['until']) + timedelta(days=1)
+    except ValueError as exc:
+        raise ValueError('Dates must be YYYY-MM-DD') from exc
+    for field in ('status', 'payment_status'):
+        value = params.get(field)
+        if value:
+            if value not in dict(Order._meta.get_field(field).choices):
+                raise ValueError(f'Unknown {field}: {value}')
+            filters[field] = value
+    if params.get('user'):
+        filters['user__username'] = params['user']
+    return filters
+
+
+def _chunks(rows, size):
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def order_rows(filters):
+    return Order.objects.filter(**filters).order_by('created_at').values(*FIELDS, username=F('user__username'))
+
+
+def archive_rows(filters):
+    return OrderArchive.objects.filter(**filters).order_by('created_at').values(*FIELDS, 'lines', username=F('user__username'))
+
+
+def _hot(filters, chunk_size):
+    rows = order_rows(filters).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        # One lines query per chunk, like prefetch_related, without building model instances.
+        lines = defaultdict(list)
+        for line in (OrderLine.objects.filter(order_id__in=[order['id'] for order in chunk])
+                     .order_by('id').values('order_id', 'title', 'unit_price', 'qty')):
+            line['unit_price'] = str(line['unit_price'])
+            lines[line.pop('order_id')].append(line)
+        for order in chunk:
+            yield {**order, 'lines': lines[order['id']], 'archived': False}
+
+
+def _archived(filters, chunk_size):
+    for order in archive_rows(filters).iterator(chunk_size=chunk_size):
+        yield {**order, 'archived': True}
+
+
+def orders(filters, chunk_size=CHUNK_SIZE):
+    """Matching orders and archived orders as dicts, oldest first, one chunk in memory at a time."""
+    return heapq.merge(_hot(filters, chunk_size), _archived(filters, chunk_size), key=itemgetter('created_at'))
+
+
+def row(order):
+    return {
+        'id': order['id'],
+        'created_at': timezone.localtime(order['created_at']).isoformat(),
+        'user': order['username'] or '',
+        'status': order['status'],
+        'payment_status': order['payment_status'],
+        'payment_method': order['payment_method'],
+        'transaction_ref': order['transaction_ref'] or '',
+        'total': str(order['total']),
+        'items': [{'title': line['title'], 'unit_price': line['unit_price'], 'qty': line['qty']} for line in order['lines']],
+        'archived': order['archived'],
+    }
+
+
+class _Line:
+    """File-like object for csv.writer that hands back the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    """``value`` for a CSV cell, with a leading ``'`` if a spreadsheet would read it as a formula.
+
+    Usernames, transaction references and dish titles come from customers.
+    """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _render(fmt):
+    if fmt == 'ndjson':
+        return lambda values: json.dumps(values, ensure_ascii=False) + '\n'
+    writer = csv.writer(_Line())
+
+    def render(values):
+        values['items'] = '; '.join(f"{item['qty']} x {item['title']}" for item in values['items'])
+        return writer.writerow([_cell(values[column]) for column in COLUMNS])
+    return render
+
+
+def stream(filters, fmt='csv', chunk_size=CHUNK_SIZE):
+    """The export as an iterator of text chunks."""
+    render = _render(fmt)
+    if fmt == 'csv':
+        yield csv.writer(_Line()).writerow(COLUMNS)
+    batch = []
+    for order in orders(filters, chunk_size):
+        batch.append(render(row(order)))
+        if len(batch) == ROWS_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+async def astream(filters, fmt='csv', chunk_size=CHUNK_SIZE):
+    """``stream`` for ASGI servers, which would otherwise read a sync iterator to the end
+    before sending anything. Every step runs on the same thread, so the cursor stays valid."""
+    chunks = stream(filters, fmt, chunk_size)
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while (chunk := await step(chunks, done)) is not done:
+        yield chunk
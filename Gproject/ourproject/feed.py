@@ -0,0 +1,135 @@
+"""Incremental order feed: orders changed since a cursor, plus tombstones for deleted ones.
+
+Orders are read in (updated_at, id) order and tombstones in (deleted_at, order_id) order,
+both by keyset pagination, and merged into one stream. The cursor is the (timestamp, id)
+of the last change handed out, so a client applies each page and asks for the next.
+
+Changes younger than ORDER_FEED_SETTLE seconds are held back: a transaction that stamped
+its rows just before another one but committed just after it would otherwise land behind
+a cursor that has already moved past it.
+
+Tombstones are kept for ORDER_FEED_RETENTION seconds. A cursor older than that may have
+missed deletions, so the view answers 410 and the client starts again without a cursor.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+from .models import Order, OrderTombstone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+BATCH_SIZE = 500
+
+_last_purge = None
+
+
+def encode_cursor(timestamp, pk):
+    return urlsafe_base64_encode(f'{(timestamp - EPOCH) // MICROSECOND}:{pk}'.encode())
+
+
+def decode_cursor(value):
+    """Return (timestamp, id) for a cursor string, None for no cursor; ValueError if malformed."""
+    if not value:
+        return None
+    try:
+        micros, pk = urlsafe_base64_decode(value).decode().split(':')
+        return EPOCH + int(micros) * MICROSECOND, int(pk)
+    except (TypeError, UnicodeDecodeError, OverflowError) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def retention_cutoff():
+    return timezone.now() - timedelta(seconds=settings.ORDER_FEED_RETENTION)
+
+
+def expired(cursor):
+    """Whether tombstones after ``cursor`` may already have been purged."""
+    return cursor is not None and cursor[0] < retention_cutoff()
+
+
+def purge(batch_size=BATCH_SIZE):
+    """Delete up to ``batch_size`` tombstones older than ORDER_FEED_RETENTION; return how many."""
+    ids = list(OrderTombstone.objects.filter(deleted_at__lt=retention_cutoff()).values_list('pk', flat=True)[:batch_size])
+    if ids:
+        OrderTombstone.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def purge_if_due():
+    global _last_purge
+    now = time.monotonic()
+    if _last_purge is not None and now - _last_purge < settings.ORDER_FEED_PURGE_INTERVAL:
+        return 0
+    _last_purge = now
+    return purge()
+
+
+def _after(queryset, time_field, id_field, cursor):
+    if cursor is None:
+        return queryset
+    timestamp, pk = cursor
+    # (time, id) > cursor, spelled with a leading range so the (time, id) index is
+    # walked in order instead of OR-ing two lookups and sorting the union.
+    return queryset.filter(Q(**{f'{time_field}__gte': timestamp}),
+                           Q(**{f'{time_field}__gt': timestamp}) | Q(**{f'{id_field}__gt': pk}))
+
+
+def order_changes(cursor, horizon):
+    return _after(Order.objects.filter(updated_at__lte=horizon), 'updated_at', 'id', cursor).order_by('updated_at', 'id')
+
+
+def tombstone_changes(cursor, horizon):
+    return (_after(OrderTombstone.objects.filter(deleted_at__lte=horizon), 'deleted_at', 'order_id', cursor)
+            .order_by('deleted_at', 'order_id'))
+
+
+def etag(cursor, limit, horizon):
+    """Fingerprint of a page, from the newest order and tombstone only; nothing is serialized."""
+    newest_order = (Order.objects.filter(updated_at__lte=horizon).order_by('-updated_at', '-id')
+                    .values_list('updated_at', 'id').first())
+    newest_tombstone = (OrderTombstone.objects.filter(deleted_at__lte=horizon).order_by('-deleted_at', '-order_id')
+                        .values_list('deleted_at', 'order_id').first())
+    key = f'{cursor}|{limit}|{newest_order}|{newest_tombstone}'
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def serialize(order):
+    user = order.user
+    return {
+        'id': order.pk,
+        'user_id': order.user_id,
+        'customer': (user.first_name or user.username) if user else None,
+        'status': order.status,
+        'payment_status': order.payment_status,
+        'payment_method': order.payment_method,
+        'total': order.total,
+        'created_at': order.created_at,
+        'updated_at': order.updated_at,
+        'lines': [{'title': line.title, 'unit_price': line.unit_price, 'qty': line.qty} for line in order.lines.all()],
+    }
+
+
+def changes(cursor, limit, horizon):
+    """One page of the feed after ``cursor``, oldest change first."""
+    orders = list(order_changes(cursor, horizon).select_related('user').prefetch_related('lines')[:limit + 1])
+    tombstones = list(tombstone_changes(cursor, horizon)[:limit + 1])
+    merged = sorted(
+        [(order.updated_at, order.pk, order) for order in orders]
+        + [(tombstone.deleted_at, tombstone.order_id, tombstone) for tombstone in tombstones],
+        key=lambda change: change[:2],
+    )
+    page = merged[:limit]
+    entries = []
+    for timestamp, pk, obj in page:
+        if isinstance(obj, Order):
+            entries.append({'op': 'upsert', 'order': serialize(obj)})
+        else:
+            entries.append({'op': 'delete', 'id': pk, 'deleted_at': timestamp})
+    next_cursor = encode_cursor(*page[-1][:2]) if page else (encode_cursor(*cursor) if cursor else None)
+    return {'changes': entries, 'cursor': next_cursor, 'has_more': len(merged) > limit}
@@ -0,0 +1,81 @@
+"""``Idempotency-Key`` support for place_order.
+
+A client sends the same key with every attempt at the same checkout. The first attempt
+stores the key, a hash of the request body and its response in the transaction that
+creates the order. A retry finds the key and gets the stored response back (marked
+``Idempotent-Replayed: true``) without writing anything. Two attempts racing with the
+same key both get as far as the insert; the unique constraint lets one commit, and the
+other rolls back its order and replays the winner's response. Reusing a key for a
+different body is a client bug and gets a 422.
+
+Keys are kept for at least IDEMPOTENCY_KEY_TTL seconds. Each worker deletes a batch of
+older ones after placing an order, at most once per IDEMPOTENCY_PURGE_INTERVAL.
+"""
+import hashlib
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+BATCH_SIZE = 500
+
+_last_purge = None
+
+
+def get_key(request):
+    """The request's key, or None without one; ValueError if it is malformed."""
+    key = request.headers.get(HEADER, '').strip()
+    if not key:
+        return None
+    if len(key) > MAX_LENGTH or not key.isascii() or not key.isprintable():
+        raise ValueError(f'{HEADER} must be at most {MAX_LENGTH} printable ASCII characters')
+    return key
+
+
+def fingerprint(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+def lookup(user, key):
+    return IdempotencyKey.objects.filter(user=user, key=key).first()
+
+
+async def alookup(user, key):
+    return await IdempotencyKey.objects.filter(user=user, key=key).afirst()
+
+
+def store(user, key, digest, response):
+    """Record ``response`` under ``key``; IntegrityError if another request got there first."""
+    IdempotencyKey.objects.create(user=user, key=key, fingerprint=digest, response=response)
+
+
+def replay(record, digest):
+    if record.fingerprint != digest:
+        return JsonResponse({'ok': False, 'error': f'This {HEADER} was already used for a different order.'}, status=422)
+    response = JsonResponse(record.response)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def purge(batch_size=BATCH_SIZE):
+    """Delete up to ``batch_size`` keys older than IDEMPOTENCY_KEY_TTL; return how many."""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    ids = list(IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list('pk', flat=True)[:batch_size])
+    if ids:
+        IdempotencyKey.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def purge_if_due():
+    global _last_purge
+    now = time.monotonic()
+    if _last_purge is not None and now - _last_purge < settings.IDEMPOTENCY_PURGE_INTERVAL:
+        return 0
+    _last_purge = now
+    return purge()
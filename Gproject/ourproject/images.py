@@ -0,0 +1,215 @@
+"""Resized WebP and JPEG renditions of the site's images, for ``srcset``.
+
+Every image gets renditions at the WIDTHS narrower than itself (plus one at its own width,
+up to the widest), in both formats, named ``<name>-<width>w.<content hash>.<ext>`` so they
+can be cached forever. A rendition set records the source and every rendition's size:
+
+    {'source': name, 'width': w, 'height': h, 'renditions': {'webp': [[name, w, h], ...], 'jpeg': [...]}}
+
+Uploaded MenuItem.image and Profile.avatar files get theirs once the save commits (see
+signals.py), stored next to the uploads and recorded on the model; a file that can't be
+read is logged and keeps its old renditions, so the save itself never fails on it. The
+static photos get theirs from ``manage.py build_images --static``, written under
+static/images/renditions/ with a manifest, before collectstatic. Templates render them with the ``{% picture %}`` tag, which
+falls back to the original image while no renditions exist.
+"""
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.templatetags.static import static
+from django.utils.text import slugify
+from PIL import Image, ImageOps
+
+WIDTHS = (160, 320, 640, 1280)
+# The <img> fallback: the widest JPEG up to this width.
+DEFAULT_WIDTH = 640
+FORMATS = {
+    'webp': ('image/webp', 'webp', {'quality': 75, 'method': 6}),
+    'jpeg': ('image/jpeg', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+STATIC_ROOT = Path(__file__).resolve().parent / 'static'
+STATIC_SOURCES = 'images'
+STATIC_RENDITIONS = 'images/renditions'
+STATIC_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+
+logger = logging.getLogger(__name__)
+
+
+def target_widths(width):
+    widths = [w for w in WIDTHS if w < width]
+    if width <= WIDTHS[-1]:
+        widths.append(width)
+    return widths or [WIDTHS[-1]]
+
+
+def _flatten(image):
+    """RGB for JPEG, composited on white if the image has transparency."""
+    if image.mode == 'RGB':
+        return image
+    rgba = image.convert('RGBA')
+    background = Image.new('RGB', rgba.size, 'white')
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    return background
+
+
+def render(source):
+    """Return the image file ``source``'s (width, height) and its renditions as (format, width, height, bytes)."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+        renditions = []
+        for width in target_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt, (_, _, options) in FORMATS.items():
+                buffer = BytesIO()
+                (_flatten(resized) if fmt == 'jpeg' else resized).save(buffer, fmt.upper(), **options)
+                renditions.append((fmt, width, height, buffer.getvalue()))
+        return image.size, renditions
+
+
+def build(source, stem, save):
+    """Render ``source`` and ``save(name, data)`` each rendition as ``<stem>-<width>w.<hash>.<ext>``."""
+    (width, height), rendered = render(source)
+    renditions = {fmt: [] for fmt in FORMATS}
+    for fmt, w, h, data in rendered:
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        renditions[fmt].append([save(f'{stem}-{w}w.{digest}.{FORMATS[fmt][1]}', data), w, h])
+    return {'width': width, 'height': height, 'renditions': renditions}
+
+
+def _stem(name):
+    folder, filename = os.path.split(name)
+    return slugify(os.path.splitext(filename)[0]) or 'image', folder
+
+
+def build_for_field(fieldfile):
+    """Renditions for an uploaded image, saved in its storage under renditions/<upload folder>/."""
+    storage = fieldfile.storage
+    slug, folder = _stem(fieldfile.name)
+
+    def save(name, data):
+        # Same content, same name: a rebuild reuses what is already there.
+        if storage.exists(name):
+            return name
+        return storage.save(name, ContentFile(data))
+
+    with fieldfile.open('rb') as source:
+        renditions = build(source, '/'.join(filter(None, ('renditions', folder, slug))), save)
+    return {'source': fieldfile.name, **renditions}
+
+
+def delete(renditions, storage, keep=()):
+    keep = {name for names in (keep or {}).get('renditions', {}).values() for name, _, _ in names}
+    for names in (renditions or {}).get('renditions', {}).values():
+        for name, _, _ in names:
+            if name not in keep:
+                storage.delete(name)
+
+
+def refresh(instance, field, store, force=False):
+    """Bring ``instance.<store>`` in line with its ``<field>`` image; return whether it changed."""
+    fieldfile = getattr(instance, field)
+    current = getattr(instance, store) or {}
+    name = fieldfile.name or ''
+    if not force and current.get('source', '') == name:
+        return False
+    fresh = build_for_field(fieldfile) if name else {}
+    type(instance).objects.filter(pk=instance.pk).update(**{store: fresh})
+    setattr(instance, store, fresh)
+    storage = fieldfile.storage
+    transaction.on_commit(lambda: delete(current, storage, keep=fresh))
+    return True
+
+
+def refresh_on_commit(instance, field, store):
+    """``refresh`` once the current transaction commits, logging a file that can't be read."""
+    def run():
+        try:
+            refresh(instance, field, store)
+        except (OSError, ValueError):  # a missing or unreadable file, as in build_images
+            logger.warning('Could not build renditions for %s %s (%s); keeping the old ones',
+                           type(instance).__name__, instance.pk, getattr(instance, field).name, exc_info=True)
+    transaction.on_commit(run)
+
+
+def build_static(root=STATIC_ROOT):
+    """Render every photo in static/images/ and write the manifest; returns it."""
+    target = root / STATIC_RENDITIONS
+    target.mkdir(parents=True, exist_ok=True)
+    previous = {path.name for path in target.iterdir()}
+
+    def save(name, data):
+        (root / name).write_bytes(data)
+        return name
+
+    manifest = {}
+    for path in sorted((root / STATIC_SOURCES).iterdir()):
+        if path.suffix.lower() not in STATIC_EXTENSIONS:
+            continue
+        source = f'{STATIC_SOURCES}/{path.name}'
+        manifest[source] = {'source': source, **build(path, f'{STATIC_RENDITIONS}/{_stem(path.name)[0]}', save)}
+    (target / 'manifest.json').write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    current = {os.path.basename(name) for entry in manifest.values()
+               for names in entry['renditions'].values() for name, _, _ in names}
+    for stale in previous - current - {'manifest.json'}:
+        (target / stale).unlink()
+    static_manifest.cache_clear()
+    return manifest
+
+
+@lru_cache(maxsize=None)
+def static_manifest():
+    try:
+        return json.loads((STATIC_ROOT / STATIC_RENDITIONS / 'manifest.json').read_text())
+    except FileNotFoundError:
+        return {}
+
+
+def picture(renditions, url, fallback):
+    """Template data for a rendition set: ``src``, ``srcset``, ``sources``, ``width``, ``height``.
+
+    ``url`` turns a rendition name into a URL; ``fallback`` is the original image's URL,
+    used on its own when there are no renditions.
+    """
+    jpegs = (renditions or {}).get('renditions', {}).get('jpeg')
+    if not jpegs:
+        return {'src': fallback, 'srcset': '', 'sources': [], 'width': None, 'height': None}
+    name, width, height = ([r for r in jpegs if r[1] <= DEFAULT_WIDTH] or jpegs[:1])[-1]
+    srcsets = {fmt: ', '.join(f'{url(n)} {w}w' for n, w, _ in names)
+               for fmt, names in renditions['renditions'].items()}
+    return {
+        'src': url(name),
+        'srcset': srcsets['jpeg'],
+        'sources': [(FORMATS[fmt][0], srcset) for fmt, srcset in srcsets.items() if fmt != 'jpeg'],
+        'width': width,
+        'height': height,
+    }
+
+
+def for_field(fieldfile, renditions):
+    if not fieldfile:
+        return None
+    storage = fieldfile.storage
+    current = renditions if (renditions or {}).get('source') == fieldfile.name else None
+    return picture(current, storage.url, fieldfile.url)
+
+
+def for_static(path):
+    return picture(static_manifest().get(path), static, static(path))
+
+
+def static_url(path, width, fmt='jpeg'):
+    """URL of the widest ``fmt`` rendition of static ``path`` up to ``width``, else of ``path``."""
+    names = static_manifest().get(path, {}).get('renditions', {}).get(fmt)
+    if not names:
+        return static(path)
+    return static(([r for r in names if r[1] <= width] or names[:1])[-1][0])
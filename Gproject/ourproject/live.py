@@ -0,0 +1,241 @@
+"""Live order events streamed to the reception, admin and customer dashboard pages.
+
+Order signals (see signals.py) publish ``order.created``, ``order.changed`` and
+``order.deleted`` events once the transaction commits. The configured bus hands every
+event to this process's ``broadcaster``, which fans it out to the open Server-Sent Events
+streams. ``LocalBus`` keeps events inside one process; ``SQLiteBus`` shares them between
+all worker processes on a host through a small SQLite file that every worker polls.
+
+Streams are served only under ASGI, where each one is an async generator that holds no
+thread while idle. Under WSGI (runserver, sync gunicorn workers) a stream would hold a
+worker for LIVE_STREAM_MAX_AGE, so the pages don't subscribe and the endpoint answers
+204, which tells EventSource to stop reconnecting.
+"""
+import asyncio
+import itertools
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateformat import format as format_date
+from django.utils.module_loading import import_string
+
+from .models import Order
+
+CHOICE_LABELS = {
+    'status': dict(Order._meta.get_field('status').choices),
+    'payment_status': dict(Order._meta.get_field('payment_status').choices),
+    'payment_method': dict(Order._meta.get_field('payment_method').choices),
+}
+# Fields an order.changed event carries; transaction references and the like stay out.
+CHANGE_FIELDS = ('status', 'payment_status', 'payment_method', 'total')
+# Only superusers and the order's owner see who ordered what; the reception board is public.
+PRIVATE_FIELDS = ('customer', 'items')
+RETRY = 'retry: 3000\n\n'
+PING = ': ping\n\n'
+
+
+class Subscription:
+    """One open stream's queue, fed from whichever thread delivers events."""
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.queue = asyncio.Queue(settings.LIVE_BACKLOG) if loop else queue.Queue(settings.LIVE_BACKLOG)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.loop:
+            try:
+                self.loop.call_soon_threadsafe(self._put, event)
+            except RuntimeError:
+                pass  # the stream's event loop has already closed
+        else:
+            self._put(event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except (asyncio.QueueFull, queue.Full):
+            # The client stopped reading; its stream ends and it reconnects with Last-Event-ID.
+            self.overflowed = True
+
+
+class Broadcaster:
+    """Fans events out to this process's subscribers and keeps recent ones for replay."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.recent = deque(maxlen=settings.LIVE_BACKLOG)
+
+    def subscribe(self, loop=None, last_id=None):
+        """Return a new Subscription and the buffered events after ``last_id``."""
+        subscription = Subscription(loop)
+        with self.lock:
+            self.subscribers.add(subscription)
+            replay = [event for event in self.recent if last_id is not None and event['id'] > last_id]
+        return subscription, replay
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def deliver(self, event):
+        with self.lock:
+            self.recent.append(event)
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+class LocalBus:
+    """Delivers events to streams in this process only (runserver, a single worker)."""
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def publish(self, kind, data):
+        with self.lock:
+            self.deliver({'id': next(self.ids), 'type': kind, 'data': data})
+
+
+class SQLiteBus:
+    """Shares events between the worker processes on one host through LIVE_BUS_PATH.
+
+    Publishing appends a row; a daemon thread in every process polls for rows newer than
+    the last one it saw and delivers them, including the process's own events. Row ids
+    are shared, so Last-Event-ID resumes correctly on any worker.
+    """
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+        self.local = threading.local()
+        db = self.connect()
+        db.execute('CREATE TABLE IF NOT EXISTS live_events ('
+                   'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, data TEXT NOT NULL, created REAL NOT NULL)')
+        self.last_id = db.execute('SELECT COALESCE(MAX(id), 0) FROM live_events').fetchone()[0]
+        self.stopped = threading.Event()
+        threading.Thread(target=self.poll, name='live-events-bus', daemon=True).start()
+
+    def connect(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(settings.LIVE_BUS_PATH, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            self.local.db = db
+        return db
+
+    def publish(self, kind, data):
+        self.connect().execute('INSERT INTO live_events (kind, data, created) VALUES (?, ?, ?)',
+                               (kind, json.dumps(data), time.time()))
+
+    def poll(self):
+        db = self.connect()
+        pruned = time.monotonic()
+        while not self.stopped.wait(settings.LIVE_POLL_INTERVAL):
+            try:
+                rows = db.execute('SELECT id, kind, data FROM live_events WHERE id > ? ORDER BY id',
+                                  (self.last_id,)).fetchall()
+                if time.monotonic() - pruned > 60:
+                    pruned = time.monotonic()
+                    db.execute('DELETE FROM live_events WHERE created < ?', (time.time() - settings.LIVE_BUS_RETENTION,))
+            except sqlite3.Error:
+                continue
+            for event_id, kind, data in rows:
+                self.last_id = event_id
+                self.deliver({'id': event_id, 'type': kind, 'data': json.loads(data)})
+
+    def close(self):
+        self.stopped.set()
+
+
+broadcaster = Broadcaster()
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                _bus = import_string(settings.LIVE_EVENT_BUS)(broadcaster.deliver)
+    return _bus
+
+
+def publish(kind, data):
+    # Round-trip through JSON so every bus hands subscribers the same plain types.
+    get_bus().publish(kind, json.loads(json.dumps(data, cls=DjangoJSONEncoder)))
+
+
+def describe(changes):
+    """Add the display label next to each choice field in ``changes``."""
+    described = dict(changes)
+    if described.get('total') is not None:
+        described['total'] = f"{described['total']:.2f}"  # as the templates show the saved DecimalField
+    for field, labels in CHOICE_LABELS.items():
+        if field in changes:
+            described[f'{field}_display'] = labels.get(changes[field], changes[field])
+    return described
+
+
+def order_changed(ids, changes):
+    return {'ids': list(ids), 'changes': describe({field: value for field, value in changes.items() if field in CHANGE_FIELDS})}
+
+
+def order_created(order):
+    """The row data for a new order; reads its lines, so call it after commit."""
+    user = order.user
+    return describe({
+        'id': order.pk,
+        'user_id': order.user_id,
+        'customer': (user.first_name or user.username) if user else 'Anonymous',
+        'items': order.item_names,
+        'total': order.total,
+        'status': order.status,
+        'payment_status': order.payment_status,
+        'created_display': format_date(timezone.localtime(order.created_at), 'M d, Y H:i'),
+    })
+
+
+def render(event, viewer):
+    """Format ``event`` as an SSE message for ``viewer`` (a (user_id, is_superuser) pair)."""
+    data = event['data']
+    user_id, is_superuser = viewer
+    if event['type'] == 'order.created' and not is_superuser and data.get('user_id') != user_id:
+        data = {key: value for key, value in data.items() if key not in PRIVATE_FIELDS}
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(data)}\n\n"
+
+
+def streams(request):
+    """Whether this request's server can hold event streams open; see the module docstring."""
+    return isinstance(request, ASGIRequest)
+
+
+async def astream(viewer, last_id):
+    """Event stream for ASGI servers; idle streams cost no thread."""
+    get_bus()  # a bus that polls for other processes' events must be running to receive them
+    subscription, replay = broadcaster.subscribe(loop=asyncio.get_running_loop(), last_id=last_id)
+    deadline = time.monotonic() + settings.LIVE_STREAM_MAX_AGE
+    try:
+        yield RETRY
+        for event in replay:
+            yield render(event, viewer)
+        while time.monotonic() < deadline and not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.LIVE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield PING
+                continue
+            yield render(event, viewer)
+    finally:
+        broadcaster.unsubscribe(subscription)
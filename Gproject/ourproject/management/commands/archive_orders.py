@@ -0,0 +1,69 @@
+"""Move finished orders out of the hot Order table into OrderArchive.
+
+    python manage.py archive_orders --older-than 90
+    python manage.py archive_orders --older-than 30 --batch-size 200 --vacuum
+
+Cancelled orders, and received orders that are paid, whose last change is more than
+--older-than days old are moved in batches, one short transaction per batch, with a pause
+in between so the site's own writes get the database. Customer dashboards read both
+tables, so nothing disappears for customers. Safe to interrupt and re-run.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from ourproject import archive
+
+
+class Command(BaseCommand):
+    help = 'Archive finished orders older than N days, in small transactions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, required=True, metavar='DAYS',
+                            help='Archive finished orders last changed more than this many days ago.')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches.')
+        parser.add_argument('--limit', type=int, help='Stop after archiving this many orders.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the orders that would be archived.')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Compact the database afterwards (locks it while running; SQLite rewrites the whole file).')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--older-than must be >= 0 and --batch-size >= 1.')
+        cutoff = timezone.now() - timedelta(days=options['older_than'])
+        if options['dry_run']:
+            self.stdout.write(f'{archive.candidates(cutoff).count()} orders would be archived.')
+            return
+
+        moved, started = 0, time.monotonic()
+        limit = options['limit']
+        while limit is None or moved < limit:
+            size = options['batch_size'] if limit is None else min(options['batch_size'], limit - moved)
+            count = archive.archive_batch(cutoff, size)
+            moved += count
+            if count < size:
+                break
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {moved} archived')
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} orders in {time.monotonic() - started:.1f}s.'))
+
+        if options['vacuum'] and moved:
+            self.vacuum()
+
+    def vacuum(self):
+        started = time.monotonic()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('VACUUM')
+                cursor.execute('PRAGMA optimize')
+            elif connection.vendor == 'postgresql':
+                for table in ('ourproject_order', 'ourproject_orderline'):
+                    cursor.execute(f'VACUUM ANALYZE {table}')
+            else:
+                raise CommandError(f'--vacuum is not supported on {connection.vendor}.')
+        self.stdout.write(f'Compacted the database in {time.monotonic() - started:.1f}s.')
@@ -0,0 +1,53 @@
+"""Build the resized WebP/JPEG renditions that templates serve through ``{% picture %}``.
+
+    python manage.py build_images            # static photos and every upload
+    python manage.py build_images --static   # only static/images/, e.g. before collectstatic
+    python manage.py build_images --uploads --force
+
+Uploads get their renditions when they are saved; this backfills the ones saved before
+(or with --force, rebuilds them all). See ourproject/images.py.
+"""
+from django.core.management.base import BaseCommand
+
+from ourproject import catalog, images
+from ourproject.models import MenuItem, Profile
+
+UPLOADS = ((MenuItem, 'image', 'image_renditions'), (Profile, 'avatar', 'avatar_renditions'))
+
+
+class Command(BaseCommand):
+    help = 'Build image renditions for static photos and uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--static', action='store_true', help='Only the photos in static/images/.')
+        parser.add_argument('--uploads', action='store_true', help='Only MenuItem images and avatars.')
+        parser.add_argument('--force', action='store_true', help='Rebuild uploads whose renditions are current.')
+
+    def handle(self, *args, **options):
+        everything = not (options['static'] or options['uploads'])
+        if options['static'] or everything:
+            self.build_static()
+        if options['uploads'] or everything:
+            self.build_uploads(options['force'])
+            # The cached menu (and the pages built from it) carries the old image URLs.
+            catalog.bump_version()
+
+    def build_static(self):
+        manifest = images.build_static()
+        originals = sum((images.STATIC_ROOT / source).stat().st_size for source in manifest)
+        smallest = sum((images.STATIC_ROOT / entry['renditions']['webp'][0][0]).stat().st_size
+                       for entry in manifest.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Built renditions for {len(manifest)} static images '
+            f'({originals // 1024} KB of originals, {smallest // 1024} KB at the smallest WebP width).'))
+
+    def build_uploads(self, force):
+        built = failed = 0
+        for model, field, store in UPLOADS:
+            for instance in model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).iterator():
+                try:
+                    built += images.refresh(instance, field, store, force=force)
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f'  {model.__name__} {instance.pk} ({getattr(instance, field).name}): {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Built renditions for {built} uploaded images ({failed} failed).'))
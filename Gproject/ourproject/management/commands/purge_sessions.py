@@ -0,0 +1,34 @@
+"""Delete expired sessions from django_session, a small batch at a time.
+
+    python manage.py purge_sessions
+    python manage.py purge_sessions --batch-size 500 --pause 0.05 --dry-run
+
+Unlike ``clearsessions``, which removes every expired row in one statement, each batch is
+its own short write, with a pause in between so the site's own writes get the database.
+Run it from cron, or set SESSION_PURGE_INTERVAL to let the workers do it.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ourproject import sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=sessions.BATCH_SIZE)
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to sleep between batches.')
+        parser.add_argument('--limit', type=int, help='Stop after deleting this many sessions.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired sessions.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be >= 1.')
+        if options['dry_run']:
+            self.stdout.write(f'{sessions.expired().count()} expired sessions would be deleted.')
+            return
+        started = time.monotonic()
+        count = sessions.purge(options['batch_size'], options['pause'], options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired sessions in {time.monotonic() - started:.1f}s.'))
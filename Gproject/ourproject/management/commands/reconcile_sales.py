@@ -0,0 +1,32 @@
+"""Rebuild the DailySales rollup from the orders and the order archive.
+
+    python manage.py reconcile_sales           # recompute and replace
+    python manage.py reconcile_sales --check   # only report drift; exit 1 if there is any
+
+The rollup is kept current as orders change (see ourproject/sales.py). Run this after
+loading or editing orders outside the app (bulk imports, raw SQL).
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from ourproject import sales
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily sales rollup from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Compare with a fresh computation without writing.')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            fresh = {key: values for key, values in sales.compute().items() if any(values)}
+            current = {key: values for key, values in sales.stored().items() if any(values)}
+            drift = sorted((key for key in fresh.keys() | current.keys() if fresh.get(key) != current.get(key)),
+                           key=lambda key: tuple(str(part) for part in key))
+            for key in drift[:20]:
+                self.stdout.write(f'  {key}: stored {current.get(key)}, actual {fresh.get(key)}')
+            if drift:
+                raise CommandError(f'{len(drift)} rollup rows differ from the orders.')
+            self.stdout.write(self.style.SUCCESS('The sales rollup matches the orders.'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the sales rollup: {sales.rebuild()} rows.'))
@@ -0,0 +1,188 @@
+"""Fill the database with a large, realistic data set for benchmarking.
+
+    python manage.py seed_bench --users 100000 --orders 1000000
+
+Rows are written with bulk_create in batches, so per-row signals (create_user_profile,
+the order receivers) never fire; profiles are bulk-created alongside their users and the
+sales rollup is rebuilt at the end. --flush removes the previous run's orders with plain
+DELETEs for the same reason, so it leaves no tombstones and publishes no live events.
+The same --seed always produces the same data.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from ourproject import archive, sales
+from ourproject.context_processors import invalidate_reception_flag
+from ourproject.models import MenuItem, Order, OrderLine, Profile
+
+DEFAULT_MENU = [
+    ('Ema Datshi', '60'),
+    ('Fried Momo', '80'),
+    ('Sikam Datshi', '70'),
+    ('Kewa Datshi', '60'),
+    ('Vegetable Curry', '90'),
+    ('Chicken Fried Rice', '120'),
+    ('Spicy Noodles', '100'),
+    ('Seasonal Salad', '70'),
+]
+
+# Relative order volume per hour of day: lunch and dinner rushes.
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 2, 3, 4, 6, 12, 14, 8, 4, 3, 5, 10, 14, 12, 6, 2, 1]
+HOUR_CUM = list(accumulate(HOUR_WEIGHTS))
+LINES_PER_ORDER_CUM = list(accumulate((35, 35, 20, 10)))
+QTY_CUM = list(accumulate((70, 22, 8)))
+
+BENCH_PASSWORD = 'bench-pass-123'
+
+
+@contextmanager
+def manual_timestamps():
+    """Let bulk_create keep the created_at/updated_at values we generate."""
+    fields = [Order._meta.get_field('created_at'), Order._meta.get_field('updated_at')]
+    saved = [(f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, (auto_now, auto_now_add) in zip(fields, saved):
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create users, profiles, menu items and orders for benchmarking.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--days', type=int, default=365, help='Spread orders over this many past days.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        # Not 'bench': scripts/bench_endpoints.py creates bench_customer and bench_admin.
+        parser.add_argument('--prefix', default='seed', help='Username prefix for generated users.')
+        parser.add_argument('--flush', action='store_true', help='Delete previously generated users and their orders first.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now().replace(microsecond=0)
+        prefix = options['prefix']
+        started = time.monotonic()
+
+        existing = User.objects.filter(username__startswith=f'{prefix}_')
+        if options['flush']:
+            with transaction.atomic():
+                self.stdout.write(f'  flushed {self.delete_orders(existing)} orders')
+                # Users have no delete receivers; the ORM cascades to their profiles in batches.
+                existing.delete()
+        elif existing.exists():
+            raise CommandError(f'Users named {prefix}_* already exist; pass --flush to replace them or choose another --prefix.')
+
+        menu = self.seed_menu()
+        user_ids = self.seed_users(prefix, options['users'])
+        self.seed_orders(user_ids, menu, options['orders'], options['days'])
+        invalidate_reception_flag()
+        self.stdout.write(f'  sales rollup {sales.rebuild()} rows')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.monotonic() - started:.1f}s.'))
+
+    def delete_orders(self, users):
+        """Delete the users' orders and their lines without loading them or firing per-row signals."""
+        ids = list(Order.objects.filter(user__in=users).values_list('pk', flat=True))
+        archive.delete_orders(ids)
+        return len(ids)
+
+    def seed_menu(self):
+        missing = [MenuItem(name=name, price=Decimal(price)) for name, price in DEFAULT_MENU
+                   if not MenuItem.objects.filter(name=name).exists()]
+        MenuItem.objects.bulk_create(missing)
+        menu = list(MenuItem.objects.filter(available=True).values_list('id', 'name', 'price'))
+        if not menu:
+            raise CommandError('No available menu items to order.')
+        return menu
+
+    def seed_users(self, prefix, count):
+        password = make_password(BENCH_PASSWORD)
+        user_ids = []
+        for start in range(0, count, self.batch_size):
+            stop = min(start + self.batch_size, count)
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}_{i:07d}', first_name=f'Guest {i}', email=f'{prefix}_{i}@example.com',
+                         password=password, date_joined=self.now - timedelta(days=self.rng.randint(0, 720)))
+                    for i in range(start, stop)
+                ])
+                Profile.objects.bulk_create([Profile(user_id=user.pk) for user in users])
+            user_ids.extend(user.pk for user in users)
+            self.stdout.write(f'  users {stop}/{count}')
+        return user_ids
+
+    def seed_orders(self, user_ids, menu, count, days):
+        if not user_ids:
+            raise CommandError('Need at least one user to place orders.')
+        rng = self.rng
+        dish_cum = list(accumulate(len(menu) - i for i in range(len(menu))))
+        with manual_timestamps():
+            for start in range(0, count, self.batch_size):
+                stop = min(start + self.batch_size, count)
+                orders, baskets = [], []
+                for _ in range(start, stop):
+                    created_at = self.random_time(days)
+                    basket = [(rng.choices(menu, cum_weights=dish_cum)[0], rng.choices((1, 2, 3), cum_weights=QTY_CUM)[0])
+                              for _ in range(rng.choices((1, 2, 3, 4), cum_weights=LINES_PER_ORDER_CUM)[0])]
+                    age = self.now - created_at
+                    status, payment_method, payment_status = self.random_state(age)
+                    orders.append(Order(
+                        # A few regulars place most of the orders.
+                        user_id=user_ids[int(len(user_ids) * rng.random() ** 2)],
+                        total=sum(price * qty for (_, _, price), qty in basket),
+                        status=status,
+                        payment_method=payment_method,
+                        payment_status=payment_status,
+                        transaction_ref=f'TX{rng.randrange(10 ** 9):09d}' if payment_method == 'qr_payment' else None,
+                        created_at=created_at,
+                        updated_at=min(self.now, created_at + timedelta(minutes=rng.randint(0, 90))),
+                    ))
+                    baskets.append(basket)
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders)
+                    OrderLine.objects.bulk_create([
+                        OrderLine(order_id=order.pk, menu_item_id=item_id, title=title, unit_price=price, qty=qty)
+                        for order, basket in zip(orders, baskets)
+                        for (item_id, title, price), qty in basket
+                    ])
+                self.stdout.write(f'  orders {stop}/{count}')
+
+    def random_time(self, days):
+        rng = self.rng
+        # Business grows over time: recent days get more orders than old ones.
+        day = int(days * (1 - rng.random() ** 0.7))
+        hour = rng.choices(range(24), cum_weights=HOUR_CUM)[0]
+        moment = (self.now - timedelta(days=day)).replace(hour=hour, minute=rng.randint(0, 59), second=rng.randint(0, 59))
+        return min(moment, self.now)
+
+    def random_state(self, age):
+        rng = self.rng
+        payment_method = rng.choices(('qr_payment', 'cash'), (60, 40))[0]
+        if age < timedelta(hours=1):
+            status = rng.choices(('on_the_way', 'received', 'cancelled'), (70, 25, 5))[0]
+        else:
+            status = rng.choices(('received', 'cancelled'), (92, 8))[0]
+        if status == 'received':
+            payment_status = rng.choices(('paid', 'pending_verification'), (97, 3))[0]
+        elif status == 'cancelled':
+            payment_status = 'unpaid'
+        elif payment_method == 'qr_payment':
+            payment_status = rng.choices(('pending_verification', 'paid', 'unpaid'), (50, 30, 20))[0]
+        else:
+            payment_status = 'unpaid'
+        return status, payment_method, payment_status
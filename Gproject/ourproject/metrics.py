@@ -0,0 +1,209 @@
+"""Per-view request metrics: wall time, SQL query count and SQL time.
+
+``RequestTimingMiddleware`` opens a ``RequestStats`` for each request; a wrapper installed
+on every database connection adds each query to the stats of the request that ran it
+(tracked with a context variable, so it also works for async views whose queries run in
+``sync_to_async`` threads). Finished requests are folded into in-process histograms.
+
+With ``METRICS_MULTIPROC_DIR`` set, each process periodically writes its totals to its own
+file in that directory and ``render()`` merges every file, so ``/metrics`` reports the sum
+over all gunicorn workers whichever worker serves the scrape.
+"""
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+HISTOGRAMS = {
+    'smarteats_http_request_duration_seconds': ('Wall time spent handling a request.', DURATION_BUCKETS),
+    'smarteats_db_queries_per_request': ('SQL queries executed per request.', QUERY_BUCKETS),
+    'smarteats_db_duration_seconds': ('Time spent in SQL per request.', DURATION_BUCKETS),
+}
+COUNTERS = {
+    'smarteats_http_requests_total': 'Requests handled, by view, method and status code.',
+}
+
+_current = ContextVar('smarteats_request_stats', default=None)
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'sql_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start_request():
+    stats = RequestStats()
+    return _current.set(stats), stats
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """connection_created receiver: time every query run on the new connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Serialises flushes, so an older snapshot never replaces a newer one.
+        self.flush_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        self.path = None
+
+    def inc(self, name, labels, amount=1):
+        key = json.dumps([name, labels])
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = json.dumps([name, labels])
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist['buckets'][i] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {key: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                               for key, h in self.histograms.items()},
+            }
+
+    def flush(self, force=False):
+        """Write this process's totals to the shared directory (throttled unless ``force``)."""
+        directory = settings.METRICS_MULTIPROC_DIR
+        if not directory or not (self.counters or self.histograms):
+            return
+        now = time.monotonic()
+        if not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self.last_flush = now
+        with self.flush_lock:
+            if self.path is None:
+                os.makedirs(directory, exist_ok=True)
+                # The start time keeps a recycled pid from overwriting a dead worker's totals.
+                self.path = os.path.join(directory, f'metrics-{os.getpid()}-{time.time_ns()}.json')
+            # A fresh temporary file per write, renamed over the old totals in one step.
+            fh = tempfile.NamedTemporaryFile('w', dir=directory, prefix='.metrics-', suffix='.tmp', delete=False)
+            try:
+                with fh:
+                    json.dump(self.snapshot(), fh)
+                os.replace(fh.name, self.path)
+            except Exception:
+                os.unlink(fh.name)
+                raise
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush(force=True))
+
+
+def observe_request(view, method, status, stats):
+    labels = {'view': view}
+    registry.inc('smarteats_http_requests_total', {'view': view, 'method': method, 'status': str(status)})
+    registry.observe('smarteats_http_request_duration_seconds', labels, stats.elapsed)
+    registry.observe('smarteats_db_queries_per_request', labels, stats.queries)
+    registry.observe('smarteats_db_duration_seconds', labels, stats.sql_time)
+    registry.flush()
+
+
+def server_timing(stats):
+    return (f'app;dur={stats.elapsed * 1000:.1f}, '
+            f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.queries} queries"')
+
+
+def _merged():
+    directory = settings.METRICS_MULTIPROC_DIR
+    if not directory:
+        return registry.snapshot()
+    registry.flush(force=True)
+    merged = {'counters': {}, 'histograms': {}}
+    for filename in sorted(os.listdir(directory)):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            continue
+        for key, value in data['counters'].items():
+            merged['counters'][key] = merged['counters'].get(key, 0) + value
+        for key, hist in data['histograms'].items():
+            target = merged['histograms'].setdefault(key, {'buckets': [0] * len(hist['buckets']), 'sum': 0.0, 'count': 0})
+            target['buckets'] = [a + b for a, b in zip(target['buckets'], hist['buckets'])]
+            target['sum'] += hist['sum']
+            target['count'] += hist['count']
+    return merged
+
+
+def _labels(labels, **extra):
+    items = {**labels, **extra}
+    return ','.join('{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"')) for k, v in items.items())
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format."""
+    data = _merged()
+    lines = []
+    by_name = {}
+    for key, value in data['counters'].items():
+        name, labels = json.loads(key)
+        by_name.setdefault(name, []).append((labels, value))
+    for name, help_text in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for labels, value in sorted(by_name.get(name, []), key=lambda item: sorted(item[0].items())):
+            lines.append(f'{name}{{{_labels(labels)}}} {value}')
+    by_name = {}
+    for key, hist in data['histograms'].items():
+        name, labels = json.loads(key)
+        by_name.setdefault(name, []).append((labels, hist))
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, hist in sorted(by_name.get(name, []), key=lambda item: sorted(item[0].items())):
+            for bound, count in zip(buckets, hist['buckets']):
+                lines.append(f'{name}_bucket{{{_labels(labels, le=bound)}}} {count}')
+            lines.append(f'{name}_bucket{{{_labels(labels, le="+Inf")}}} {hist["count"]}')
+            lines.append(f'{name}_sum{{{_labels(labels)}}} {hist["sum"]}')
+            lines.append(f'{name}_count{{{_labels(labels)}}} {hist["count"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,124 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics, profiling
+
+
+class RequestTimingMiddleware:
+    """Time each request, count its SQL, and report both in a Server-Timing header and /metrics."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token, stats = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        token, stats = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        response['Server-Timing'] = metrics.server_timing(stats)
+        metrics.observe_request(view, request.method, response.status_code, stats)
+        return response
+
+
+class ProfilerMiddleware:
+    """Profile a request when a superuser asks for it, or 1 in PROFILER_SAMPLE_RATE requests to disk."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        fmt = profiling.requested_format(request)
+        if not (fmt or profiling.should_sample()) or not profiling.acquire():
+            return self.get_response(request)
+        try:
+            profile = profiling.Profile(sampling=fmt == 'text')
+            profile.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.stop()
+        finally:
+            profiling.release()
+        return self.finish(request, response, profile, fmt)
+
+    async def __acall__(self, request):
+        fmt = await profiling.arequested_format(request)
+        if not (fmt or profiling.should_sample()) or not profiling.acquire():
+            return await self.get_response(request)
+        try:
+            profile = profiling.Profile(sampling=fmt == 'text')
+            profile.start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profile.stop()
+        finally:
+            profiling.release()
+        return self.finish(request, response, profile, fmt)
+
+    def finish(self, request, response, profile, fmt):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else None
+        if fmt:
+            return profiling.report(request, response, profile, fmt, view)
+        profiling.store(request, profile, view)
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that can also run async.
+
+    WhiteNoiseMiddleware is sync-only, and under ASGI a sync middleware makes Django run
+    everything below it (every async view included) through a thread. This one serves
+    static files from a thread and passes every other request straight on.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0007_menuitem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(help_text='Dish name at the time of ordering', max_length=100)),
+                ('unit_price', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('qty', models.PositiveIntegerField(default=1)),
+                ('menu_item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='order_lines', to='ourproject.menuitem')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='ourproject.order')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
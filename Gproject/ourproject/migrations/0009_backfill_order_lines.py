@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:42
+
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal('0')
+
+
+def _to_qty(value):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return 1
+
+
+def forwards(apps, schema_editor):
+    Order = apps.get_model('ourproject', 'Order')
+    OrderLine = apps.get_model('ourproject', 'OrderLine')
+    MenuItem = apps.get_model('ourproject', 'MenuItem')
+    menu_ids = dict(MenuItem.objects.values_list('name', 'id'))
+    lines = []
+    for order_id, raw in Order.objects.values_list('id', 'items').iterator(chunk_size=2000):
+        try:
+            items = json.loads(raw or '[]')
+        except (TypeError, ValueError):
+            items = []
+        if isinstance(items, dict):
+            items = [items]
+        if not isinstance(items, list):
+            items = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            title = str(item.get('title') or item.get('name') or '')[:100]
+            lines.append(OrderLine(
+                order_id=order_id,
+                menu_item_id=menu_ids.get(title),
+                title=title,
+                unit_price=_to_decimal(item.get('price', 0)),
+                qty=_to_qty(item.get('qty', 1)),
+            ))
+        if len(lines) >= 2000:
+            OrderLine.objects.bulk_create(lines)
+            lines = []
+    OrderLine.objects.bulk_create(lines)
+
+
+def backwards(apps, schema_editor):
+    Order = apps.get_model('ourproject', 'Order')
+    OrderLine = apps.get_model('ourproject', 'OrderLine')
+    items_by_order = {}
+    for order_id, title, price, qty in OrderLine.objects.order_by('id').values_list('order_id', 'title', 'unit_price', 'qty'):
+        items_by_order.setdefault(order_id, []).append({'title': title, 'price': float(price), 'qty': qty})
+    for order_id, items in items_by_order.items():
+        Order.objects.filter(pk=order_id).update(items=json.dumps(items))
+    OrderLine.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0008_orderline'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0009_backfill_order_lines'),
+    ]
+
+    operations = [
+        # Give the column a default first so unapplying the removal can re-add it to existing rows.
+        migrations.AlterField(
+            model_name='order',
+            name='items',
+            field=models.TextField(default='[]', help_text='JSON list of items'),
+        ),
+        migrations.RemoveField(
+            model_name='order',
+            name='items',
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:20
+
+from decimal import Decimal
+
+from django.db import migrations
+
+# The dishes the order page used to hardcode, so it is not empty on an existing install.
+DISHES = [
+    ('Ema Datshi', '60'),
+    ('Fried Momo', '80'),
+    ('Sikam Datshi', '70'),
+    ('Kewa Datshi', '60'),
+    ('Vegetable Curry', '90'),
+    ('Chicken Fried Rice', '120'),
+    ('Spicy Noodles', '100'),
+    ('Seasonal Salad', '70'),
+]
+
+
+def forwards(apps, schema_editor):
+    MenuItem = apps.get_model('ourproject', 'MenuItem')
+    existing = set(MenuItem.objects.values_list('name', flat=True))
+    MenuItem.objects.bulk_create(
+        MenuItem(name=name, price=Decimal(price)) for name, price in DISHES if name not in existing
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0011_order_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
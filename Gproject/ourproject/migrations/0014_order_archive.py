@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0013_order_feed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('status', models.CharField(choices=[('on_the_way', 'On the way'), ('received', 'Received'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('payment_method', models.CharField(choices=[('qr_payment', 'QR Payment'), ('cash', 'Cash')], max_length=20)),
+                ('payment_status', models.CharField(choices=[('paid', 'Paid'), ('pending_verification', 'Pending Verification'), ('unpaid', 'Unpaid')], max_length=20)),
+                ('transaction_ref', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('lines', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'updated_at'], name='order_status_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='orderarchive',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_orders', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='orderarchive',
+            index=models.Index(fields=['user', '-created_at'], name='archive_user_created_idx'),
+        ),
+    ]
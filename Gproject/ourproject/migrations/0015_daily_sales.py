@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0014_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('status', models.CharField(choices=[('on_the_way', 'On the way'), ('received', 'Received'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('payment_method', models.CharField(choices=[('qr_payment', 'QR Payment'), ('cash', 'Cash')], max_length=20)),
+                ('dish', models.CharField(blank=True, help_text='Empty for the whole-order totals', max_length=100)),
+                ('orders', models.IntegerField(default=0)),
+                ('quantity', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'status', 'payment_method', 'dish'), name='dailysales_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:29
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0015_daily_sales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderarchive',
+            index=models.Index(fields=['created_at'], name='archive_created_idx'),
+        ),
+    ]
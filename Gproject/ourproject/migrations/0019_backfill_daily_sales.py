@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:05
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def _add(rows, key, orders, quantity, revenue):
+    row = rows.setdefault(key, [0, 0, Decimal(0)])
+    row[0] += orders
+    row[1] += quantity
+    row[2] += revenue
+
+
+def _contribute(rows, order, lines):
+    # As ourproject.sales.contribute: lines are (dish, qty, amount).
+    key = (timezone.localdate(order.created_at), order.status, order.payment_method)
+    _add(rows, key + ('',), 1, sum(qty for _, qty, _ in lines), Decimal(order.total))
+    dishes = {}
+    for dish, qty, amount in lines:
+        totals = dishes.setdefault(dish, [0, Decimal(0)])
+        totals[0] += qty
+        totals[1] += amount
+    for dish, (qty, amount) in dishes.items():
+        _add(rows, key + (dish,), 1, qty, amount)
+
+
+def forwards(apps, schema_editor):
+    """Rebuild the rollup; 0015 created it empty, so it only counts orders placed since."""
+    Order = apps.get_model('ourproject', 'Order')
+    OrderArchive = apps.get_model('ourproject', 'OrderArchive')
+    DailySales = apps.get_model('ourproject', 'DailySales')
+    rows = {}
+    for order in Order.objects.prefetch_related('lines').iterator(chunk_size=2000):
+        _contribute(rows, order, [(line.title, line.qty, line.unit_price * line.qty) for line in order.lines.all()])
+    for archived in OrderArchive.objects.iterator(chunk_size=2000):
+        _contribute(rows, archived, [(line['title'], line['qty'], Decimal(line['unit_price']) * line['qty'])
+                                     for line in archived.lines])
+    DailySales.objects.all().delete()
+    DailySales.objects.bulk_create(
+        [DailySales(day=day, status=status, payment_method=payment_method, dish=dish,
+                    orders=orders, quantity=quantity, revenue=revenue)
+         for (day, status, payment_method, dish), (orders, quantity, revenue) in rows.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ourproject', '0018_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
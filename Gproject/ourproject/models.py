@@ -8,6 +8,8 @@ class Profile(models.Model):
 	user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
 	bio = models.TextField(blank=True, help_text="Tell us about yourself")
 	avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
+	# Resized WebP/JPEG copies of the avatar; see images.py
+	avatar_renditions = models.JSONField(default=dict, blank=True, editable=False)
 	location = models.CharField(max_length=100, blank=True, help_text="Your location")
 	website = models.URLField(blank=True, help_text="Your website or social media")
 	phone = models.CharField(max_length=20, blank=True, help_text="Phone number")
@@ -29,7 +31,6 @@ class Order(models.Model):
 		('cancelled', 'Cancelled'),
 	]
 	user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
-	items = models.TextField(help_text='JSON list of items')
 	total = models.DecimalField(max_digits=8, decimal_places=2, default=0)
 	status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='on_the_way')
 	payment_method = models.CharField(max_length=20, choices=[('qr_payment', 'QR Payment'), ('cash', 'Cash')], default='cash')
@@ -38,18 +39,142 @@ class Order(models.Model):
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
+	class Meta:
+		indexes = [
+			# reception / admin_dashboard: latest orders; export_orders: orders by date
+			models.Index(fields=['-created_at'], name='order_created_idx'),
+			# customer_dashboard: a customer's latest orders
+			models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+			# reception: a customer's unpaid orders, newest first
+			models.Index(fields=['user', 'payment_status', '-created_at'], name='order_user_payment_created_idx'),
+			# reception_flag context processor; archive_orders: finished orders by age
+			models.Index(fields=['status', 'updated_at'], name='order_status_updated_idx'),
+			# order_feed: keyset pagination on (updated_at, id)
+			models.Index(fields=['updated_at', 'id'], name='order_updated_id_idx'),
+		]
+
 	def __str__(self):
 		return f"Order {self.id} - {self.status} - {self.total}"
 
+	@property
+	def item_names(self):
+		# Uses the prefetched lines when the queryset was built with prefetch_related('lines')
+		return ', '.join(line.title for line in self.lines.all())
+
 
 class MenuItem(models.Model):
 	name = models.CharField(max_length=100)
 	description = models.TextField(blank=True)
 	price = models.DecimalField(max_digits=6, decimal_places=2)
 	image = models.ImageField(upload_to='menu_images/', blank=True, null=True)
+	# Resized WebP/JPEG copies of the image; see images.py
+	image_renditions = models.JSONField(default=dict, blank=True, editable=False)
 	available = models.BooleanField(default=True)
 
 	def __str__(self):
 		return self.name
 
-# Create your models here.
+
+class OrderLine(models.Model):
+	order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='lines')
+	menu_item = models.ForeignKey(MenuItem, null=True, blank=True, on_delete=models.SET_NULL, related_name='order_lines')
+	title = models.CharField(max_length=100, help_text='Dish name at the time of ordering')
+	unit_price = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+	qty = models.PositiveIntegerField(default=1)
+
+	class Meta:
+		ordering = ['id']
+
+	def __str__(self):
+		return f"{self.qty} x {self.title}"
+
+	@property
+	def line_total(self):
+		return self.unit_price * self.qty
+
+
+
+class OrderTombstone(models.Model):
+	"""Marks a deleted order so the order feed can tell clients to drop it."""
+	order_id = models.BigIntegerField()
+	deleted_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['deleted_at', 'order_id'], name='tombstone_deleted_idx'),
+		]
+
+	def __str__(self):
+		return f"Deleted order {self.order_id}"
+
+
+class OrderArchive(models.Model):
+	"""A finished order moved out of Order by ``manage.py archive_orders``, lines inline."""
+	id = models.BigIntegerField(primary_key=True)  # the original Order id
+	user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='archived_orders')
+	total = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+	status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+	payment_method = models.CharField(max_length=20, choices=Order._meta.get_field('payment_method').choices)
+	payment_status = models.CharField(max_length=20, choices=Order._meta.get_field('payment_status').choices)
+	transaction_ref = models.CharField(max_length=100, blank=True, null=True)
+	created_at = models.DateTimeField()
+	updated_at = models.DateTimeField()
+	archived_at = models.DateTimeField(auto_now_add=True)
+	# [{'menu_item_id', 'title', 'unit_price', 'qty'}, ...] as the OrderLines were
+	lines = models.JSONField(default=list)
+
+	class Meta:
+		indexes = [
+			# customer_dashboard: a customer's latest orders
+			models.Index(fields=['user', '-created_at'], name='archive_user_created_idx'),
+			# export_orders: archived orders by date
+			models.Index(fields=['created_at'], name='archive_created_idx'),
+		]
+
+	def __str__(self):
+		return f"Archived order {self.id} - {self.status} - {self.total}"
+
+	@property
+	def item_names(self):
+		return ', '.join(line['title'] for line in self.lines)
+
+
+class DailySales(models.Model):
+	"""Sales per day, order status, payment method and dish, kept current by ourproject/sales.py."""
+	day = models.DateField()
+	status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+	payment_method = models.CharField(max_length=20, choices=Order._meta.get_field('payment_method').choices)
+	dish = models.CharField(max_length=100, blank=True, help_text='Empty for the whole-order totals')
+	orders = models.IntegerField(default=0)
+	quantity = models.IntegerField(default=0)
+	revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+	class Meta:
+		constraints = [
+			# The upsert key; leading with day, it also serves the report's date range.
+			models.UniqueConstraint(fields=['day', 'status', 'payment_method', 'dish'], name='dailysales_key'),
+		]
+
+	def __str__(self):
+		return f"{self.day} {self.status}/{self.payment_method} {self.dish or 'all dishes'}: {self.revenue}"
+
+
+class IdempotencyKey(models.Model):
+	"""A placed order's Idempotency-Key and the response it got, replayed to retries (see ourproject/idempotency.py)."""
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+	key = models.CharField(max_length=100)
+	fingerprint = models.CharField(max_length=64, help_text='SHA-256 of the request body')
+	response = models.JSONField()
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key'),
+		]
+		indexes = [
+			# TTL cleanup
+			models.Index(fields=['created_at'], name='idempotency_created_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.user_id}:{self.key}"
@@ -0,0 +1,55 @@
+"""Whole-page cache for the pages that look the same to every visitor.
+
+``index``, ``menu`` and ``aboutus`` differ per visitor only in the header's auth links.
+Each page is cached in two variants: anonymous (no session cookie), which is complete, and
+authenticated, where the auth links are a hole that main.js fills in from
+``/fragments/auth/``. Neither variant reads the session or the user, so a cached page is
+served without rendering a template or touching the database.
+
+The key carries the menu version and the reception flag, so the menu and order signals
+that move either one (see signals.py) retire the cached pages too.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from . import catalog
+from .context_processors import reception_flag
+
+PAGE_KEY = 'page:{}:{}:{}:{}'
+ANONYMOUS = 'anonymous'
+AUTHENTICATED = 'authenticated'
+
+
+def variant(request):
+    # The cookie is enough to tell the variants apart; a stale one just gets the hole.
+    return AUTHENTICATED if settings.SESSION_COOKIE_NAME in request.COOKIES else ANONYMOUS
+
+
+def page_key(request, page_variant):
+    has_received = reception_flag(request)['reception_has_received']
+    return PAGE_KEY.format(request.path, page_variant, catalog.version(), int(has_received))
+
+
+def cached_page(view):
+    """Serve ``view``'s GET responses from the page cache, per auth variant."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.GET or not settings.PAGE_CACHE_TIMEOUT:
+            return view(request, *args, **kwargs)
+        request.page_cache = variant(request)
+        key = page_key(request, request.page_cache)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+        response = view(request, *args, **kwargs)
+        # A response that sets a cookie belongs to one visitor only.
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            cache.set(key, (response.content, response['Content-Type']), settings.PAGE_CACHE_TIMEOUT)
+        return response
+
+    return wrapper
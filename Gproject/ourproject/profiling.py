@@ -0,0 +1,146 @@
+"""On-demand and sampled request profiling.
+
+A superuser adds ``?profile`` (or the ``X-Profile`` header) to any URL to get a profile of
+that request instead of the page: ``text`` (the default) returns a report sorted by
+``profile_sort`` (cumulative time unless given), ``prof`` downloads a ``.prof`` file for
+``python -m pstats`` / snakeviz. The text report comes from pyinstrument's sampling
+profiler when it is installed, and from cProfile otherwise.
+
+With ``PROFILER_SAMPLE_RATE = N`` one request in N is profiled with cProfile and written to
+``PROFILER_DIR``, keeping only the newest ``PROFILER_KEEP`` files.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+FORMATS = {'': 'text', '1': 'text', 'text': 'text', 'prof': 'prof'}
+SORT_KEYS = {key.value for key in pstats.SortKey}
+REPORT_LINES = 80
+
+# Only one profiler can be active per process (sys.setprofile is per thread, but
+# sys.monitoring in newer Pythons is global), so concurrent requests are not profiled.
+_lock = threading.Lock()
+
+
+def _format(request):
+    value = request.GET.get('profile', request.META.get('HTTP_X_PROFILE'))
+    if value is None or value.lower() not in FORMATS:
+        return None
+    return FORMATS[value.lower()]
+
+
+def _is_superuser(user):
+    return bool(user and user.is_authenticated and user.is_superuser)
+
+
+def requested_format(request):
+    """Return 'text' or 'prof' if a superuser asked for a profile of this request."""
+    fmt = _format(request)
+    # Only look at the user once a profile was asked for, so normal requests
+    # don't load the session and user.
+    if fmt is None or not _is_superuser(getattr(request, 'user', None)):
+        return None
+    return fmt
+
+
+async def arequested_format(request):
+    """requested_format() for the async middleware path."""
+    fmt = _format(request)
+    if fmt is None or not hasattr(request, 'auser') or not _is_superuser(await request.auser()):
+        return None
+    return fmt
+
+
+def should_sample():
+    rate = settings.PROFILER_SAMPLE_RATE
+    return rate > 0 and random.randrange(rate) == 0
+
+
+def acquire():
+    return _lock.acquire(blocking=False)
+
+
+def release():
+    _lock.release()
+
+
+class Profile:
+    """Wraps the profiler used for one request."""
+
+    def __init__(self, sampling=False):
+        self.sampling = sampling and SamplingProfiler is not None
+        self.profiler = SamplingProfiler(async_mode='enabled') if self.sampling else cProfile.Profile()
+
+    def start(self):
+        if self.sampling:
+            self.profiler.start()
+        else:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.sampling:
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+
+    def text(self, sort='cumulative'):
+        if self.sampling:
+            return self.profiler.output_text(unicode=True, show_all=False)
+        out = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=out)
+        stats.strip_dirs().sort_stats(sort if sort in SORT_KEYS else 'cumulative').print_stats(REPORT_LINES)
+        return out.getvalue()
+
+    def dump(self):
+        """Return the profile in the binary format read by pstats.Stats()."""
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+
+def _filename(request, view_name):
+    slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', view_name or request.path).strip('-') or 'root'
+    seconds, nanos = divmod(time.time_ns(), 10**9)
+    # Timestamp first so a plain sort is oldest-first for rotation.
+    return f'{time.strftime("%Y%m%d-%H%M%S", time.localtime(seconds))}.{nanos:09d}-{slug}-{os.getpid()}.prof'
+
+
+def report(request, response, profile, fmt, view_name):
+    """Build the response that replaces the page for an on-demand profile."""
+    if fmt == 'prof':
+        download = HttpResponse(profile.dump(), content_type='application/octet-stream')
+        download['Content-Disposition'] = f'attachment; filename="{_filename(request, view_name)}"'
+        return download
+    header = f'{request.method} {request.get_full_path()} -> {response.status_code} ({view_name or "unresolved"})\n\n'
+    return HttpResponse(header + profile.text(request.GET.get('profile_sort', 'cumulative')),
+                        content_type='text/plain; charset=utf-8')
+
+
+def store(request, profile, view_name):
+    """Write a sampled profile to PROFILER_DIR and drop the oldest beyond PROFILER_KEEP."""
+    directory = settings.PROFILER_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, _filename(request, view_name))
+    with open(f'{path}.tmp', 'wb') as fh:
+        fh.write(profile.dump())
+    os.replace(f'{path}.tmp', path)
+    stored = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+    for name in stored[:max(len(stored) - settings.PROFILER_KEEP, 0)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    return path
@@ -0,0 +1,231 @@
+"""Token-bucket rate limits for views, and shedding load when a worker is saturated.
+
+    @ratelimit('place_order', '10/m', key='user')
+    @ratelimit('login', '20/m', key='ip', methods=('POST',))
+
+A limit of ``n/period`` lets a client make ``n`` requests at once and then one every
+``period / n``. Over the limit the view isn't called: the client gets a 429 with
+``Retry-After``. Each bucket is a single number, the time at which it will be full again
+(GCRA), so taking a token is one read and one write. Buckets live in the default cache so
+that, with a shared cache, every worker enforces the same limit. With LocMemCache (the
+default) each worker has its own. A process lock makes each take atomic between threads,
+and with a shared cache a short-lived cache lock makes it atomic between workers. If the
+cache fails, an in-process copy of the bucket is used instead.
+
+``ConcurrencyLimitMiddleware`` answers 503 to requests over CONCURRENCY_LIMIT (or writes
+over CONCURRENCY_LIMIT_WRITES) in flight in this worker, before the session is read.
+RATELIMIT_ENABLED=False turns both off, e.g. for benchmarks.
+"""
+import logging
+import math
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse, JsonResponse
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+KEY_PREFIX = 'ratelimit:'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+# The local fallback forgets full buckets once it holds this many.
+LOCAL_MAX_KEYS = 10000
+
+_lock = threading.Lock()
+_local = {}
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> (10, 60.0): requests, seconds."""
+    count, _, period = rate.partition('/')
+    multiple = period[:-1] or '1'
+    return int(count), float(multiple) * PERIODS[period[-1]]
+
+
+def _advance(full_at, now, count, period):
+    """GCRA: (allowed, new full_at, seconds to wait) for one more request."""
+    interval = period / count
+    full_at = max(full_at or now, now) + interval
+    wait = full_at - period - now
+    if wait > 0:
+        return False, None, wait
+    return True, full_at, 0.0
+
+
+def _take_local(key, now, count, period):
+    allowed, full_at, wait = _advance(_local.get(key), now, count, period)
+    if allowed:
+        if len(_local) >= LOCAL_MAX_KEYS:
+            for stale in [k for k, v in _local.items() if v <= now]:
+                del _local[stale]
+        _local[key] = full_at
+    return allowed, wait
+
+
+def _is_shared(backend):
+    # LocMemCache lives in this process: the process lock is enough, and it never blocks.
+    return not isinstance(backend, LocMemCache)
+
+
+def _take_cached(backend, key, now, count, period):
+    shared = _is_shared(backend)
+    lock_key = key + ':lock'
+    if shared:
+        for _ in range(20):
+            if backend.add(lock_key, 1, 1):
+                break
+            time.sleep(0.002)
+        else:
+            raise TimeoutError(f'{lock_key} is held')
+    try:
+        allowed, full_at, wait = _advance(backend.get(key), now, count, period)
+        if allowed:
+            backend.set(key, full_at, math.ceil(full_at - now) + 1)
+        return allowed, wait
+    finally:
+        if shared:
+            backend.delete(lock_key)
+
+
+def take(scope, ident, rate):
+    """Take a token from ``scope``'s bucket for ``ident``; return (allowed, seconds to wait)."""
+    count, period = parse_rate(rate)
+    key = f'{KEY_PREFIX}{scope}:{ident}'
+    now = time.time()
+    backend = caches['default']
+    try:
+        if _is_shared(backend):
+            return _take_cached(backend, key, now, count, period)
+        with _lock:
+            return _take_cached(backend, key, now, count, period)
+    except Exception:
+        logger.warning("Rate limit cache unavailable, using this process's buckets", exc_info=True)
+        with _lock:
+            return _take_local(key, now, count, period)
+
+
+def client_ip(request):
+    """The client's address: REMOTE_ADDR, or the entry RATELIMIT_PROXY_COUNT proxies back in X-Forwarded-For."""
+    proxies = settings.RATELIMIT_PROXY_COUNT
+    forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if part.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _ident(request, user, key):
+    if key != 'ip' and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+def too_many(request, wait):
+    retry_after = str(max(1, math.ceil(wait)))
+    message = 'Too many requests. Please wait a moment and try again.'
+    if request.content_type == 'application/json':
+        response = JsonResponse({'ok': False, 'error': message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = retry_after
+    return response
+
+
+def ratelimit(scope, rate, key='user', methods=WRITE_METHODS):
+    """Limit the decorated view to ``rate`` (``'10/m'``) of ``methods`` requests per signed-in
+    user (``key='user'``, by IP for anonymous visitors) or per IP (``key='ip'``).
+    Works on sync and async views."""
+    parse_rate(rate)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapped(request, *args, **kwargs):
+                if settings.RATELIMIT_ENABLED and request.method in methods:
+                    ident = _ident(request, await request.auser(), key)
+                    if _is_shared(caches['default']):
+                        allowed, wait = await sync_to_async(take)(scope, ident, rate)
+                    else:
+                        allowed, wait = take(scope, ident, rate)
+                    if not allowed:
+                        return too_many(request, wait)
+                return await view(request, *args, **kwargs)
+        else:
+            @wraps(view)
+            def wrapped(request, *args, **kwargs):
+                if settings.RATELIMIT_ENABLED and request.method in methods:
+                    allowed, wait = take(scope, _ident(request, request.user, key), rate)
+                    if not allowed:
+                        return too_many(request, wait)
+                return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
+
+
+class ConcurrencyLimitMiddleware:
+    """503 instead of queueing when this worker already has too many requests in flight.
+
+    Requests over the limit are turned away before the session or the database is touched,
+    so a flood can't pile up behind SQLite's write lock. Streamed responses stop counting
+    once their headers are out.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lock = threading.Lock()
+        self.active = 0
+        self.writes = 0
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def enter(self, write):
+        """Count the request in, or return False if it should be shed."""
+        with self.lock:
+            if settings.CONCURRENCY_LIMIT and self.active >= settings.CONCURRENCY_LIMIT:
+                return False
+            if write and settings.CONCURRENCY_LIMIT_WRITES and self.writes >= settings.CONCURRENCY_LIMIT_WRITES:
+                return False
+            self.active += 1
+            self.writes += write
+            return True
+
+    def leave(self, write):
+        with self.lock:
+            self.active -= 1
+            self.writes -= write
+
+    def shed(self):
+        response = HttpResponse('The server is busy. Please try again in a moment.', status=503, content_type='text/plain')
+        response['Retry-After'] = '1'
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.RATELIMIT_ENABLED:
+            return self.get_response(request)
+        write = request.method in WRITE_METHODS
+        if not self.enter(write):
+            return self.shed()
+        try:
+            return self.get_response(request)
+        finally:
+            self.leave(write)
+
+    async def __acall__(self, request):
+        if not settings.RATELIMIT_ENABLED:
+            return await self.get_response(request)
+        write = request.method in WRITE_METHODS
+        if not self.enter(write):
+            return self.shed()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.leave(write)
@@ -0,0 +1,183 @@
+"""The DailySales rollup behind the admin sales report.
+
+One row per (day, order status, payment method, dish) counts orders, dishes sold and
+revenue; the row with ``dish == ''`` holds whole-order totals. It is updated in the same
+transaction as the change it reflects: place_order records new orders, the transitions
+move an order between rows when its status or payment method changes, edits in the admin
+move it as it was saved, and deleting an order takes it out. Archived orders stay counted;
+they are still sales.
+
+Updates are additive upserts, so concurrent orders never overwrite each other's counts.
+``manage.py reconcile_sales`` recomputes the rollup from Order and OrderArchive.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailySales, Order, OrderArchive, OrderLine
+
+WHOLE_ORDER = ''
+DIMENSIONS = ('status', 'payment_method')
+
+# lines: [(dish, qty, amount)]
+Snapshot = namedtuple('Snapshot', 'order_id day status payment_method total lines')
+
+
+def snapshot(order, lines):
+    """An order's contribution to the rollup; ``lines`` are OrderLines or archived line dicts."""
+    items = []
+    for line in lines:
+        if isinstance(line, dict):
+            items.append((line['title'], line['qty'], Decimal(line['unit_price']) * line['qty']))
+        else:
+            items.append((line.title, line.qty, line.unit_price * line.qty))
+    return Snapshot(order.pk, timezone.localdate(order.created_at), order.status, order.payment_method,
+                    Decimal(order.total), items)
+
+
+def snapshots(queryset):
+    return [snapshot(order, order.lines.all()) for order in queryset.prefetch_related('lines')]
+
+
+def before(rows, pins):
+    """Snapshots of orders as a transition's UPDATE found them.
+
+    ``rows`` are the rows it returned, as updated; ``pins`` the values its WHERE clause
+    required of the columns it changed.
+    """
+    lines = {row['id']: [] for row in rows}
+    for order_id, title, qty, unit_price in (OrderLine.objects.filter(order_id__in=list(lines))
+                                            .values_list('order_id', 'title', 'qty', 'unit_price')):
+        lines[order_id].append((title, qty, unit_price * qty))
+    return [Snapshot(row['id'], timezone.localdate(row['created_at']), pins.get('status', row['status']),
+                     pins.get('payment_method', row['payment_method']), Decimal(row['total']), lines[row['id']])
+            for row in rows]
+
+
+def affected(changes):
+    return any(field in changes for field in DIMENSIONS)
+
+
+def _add(deltas, key, orders, quantity, revenue):
+    row = deltas.setdefault(key, [0, 0, Decimal(0)])
+    row[0] += orders
+    row[1] += quantity
+    row[2] += revenue
+
+
+def contribute(deltas, snap, sign=1):
+    key = (snap.day, snap.status, snap.payment_method)
+    _add(deltas, key + (WHOLE_ORDER,), sign, sign * sum(qty for _, qty, _ in snap.lines), sign * snap.total)
+    dishes = {}
+    for dish, qty, amount in snap.lines:
+        totals = dishes.setdefault(dish, [0, Decimal(0)])
+        totals[0] += qty
+        totals[1] += amount
+    for dish, (qty, amount) in dishes.items():
+        _add(deltas, key + (dish,), sign, sign * qty, sign * amount)
+
+
+def upsert(deltas):
+    """Add ``deltas`` ({(day, status, payment_method, dish): [orders, quantity, revenue]}) in one statement."""
+    rows = [key + tuple(values) for key, values in deltas.items() if any(values)]
+    if not rows:
+        return
+    table = connection.ops.quote_name(DailySales._meta.db_table)
+    values = ', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(rows))
+    # Same syntax on SQLite (3.24+) and PostgreSQL; each key appears once, as PostgreSQL requires.
+    sql = (f'INSERT INTO {table} (day, status, payment_method, dish, orders, quantity, revenue) VALUES {values} '
+           f'ON CONFLICT (day, status, payment_method, dish) DO UPDATE SET '
+           f'orders = {table}.orders + excluded.orders, quantity = {table}.quantity + excluded.quantity, '
+           f'revenue = {table}.revenue + excluded.revenue')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+
+
+def record(snaps, sign=1):
+    deltas = {}
+    for snap in snaps:
+        contribute(deltas, snap, sign)
+    upsert(deltas)
+
+
+def move(snaps, changes):
+    """Move orders from their old (status, payment method) rows to the ones ``changes`` gives them."""
+    deltas = {}
+    for snap in snaps:
+        moved = snap._replace(**{field: changes[field] for field in DIMENSIONS if field in changes})
+        if moved != snap:
+            contribute(deltas, snap, -1)
+            contribute(deltas, moved)
+    upsert(deltas)
+
+
+def compute():
+    """The rollup recomputed from scratch, as upsert deltas."""
+    deltas = {}
+    day = TruncDate('created_at')
+    for row in (Order.objects.annotate(day=day).values('day', 'status', 'payment_method')
+                .annotate(count=Count('id'), revenue=Sum('total')).order_by()):
+        _add(deltas, (row['day'], row['status'], row['payment_method'], WHOLE_ORDER), row['count'], 0, row['revenue'])
+    lines = OrderLine.objects.annotate(day=TruncDate('order__created_at')).values(
+        'day', status=F('order__status'), payment_method=F('order__payment_method'))
+    for row in lines.annotate(quantity=Sum('qty')).order_by():
+        _add(deltas, (row['day'], row['status'], row['payment_method'], WHOLE_ORDER), 0, row['quantity'], 0)
+    for row in (lines.values('day', 'status', 'payment_method', 'title')
+                .annotate(count=Count('order', distinct=True), quantity=Sum('qty'),
+                          revenue=Sum(F('unit_price') * F('qty'))).order_by()):
+        _add(deltas, (row['day'], row['status'], row['payment_method'], row['title']),
+             row['count'], row['quantity'], row['revenue'])
+    for archived in OrderArchive.objects.iterator(chunk_size=2000):
+        contribute(deltas, snapshot(archived, archived.lines))
+    return deltas
+
+
+def stored():
+    return {(row.day, row.status, row.payment_method, row.dish): [row.orders, row.quantity, row.revenue]
+            for row in DailySales.objects.all()}
+
+
+def rebuild():
+    """Replace the rollup with a fresh computation; returns the number of rows written."""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Hold off incremental updates until the rebuilt rows are committed.
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {DailySales._meta.db_table} IN EXCLUSIVE MODE')
+        # On SQLite the delete takes the write lock before anything is read.
+        DailySales.objects.all().delete()
+        rows = [DailySales(day=day, status=status, payment_method=payment_method, dish=dish,
+                           orders=orders, quantity=quantity, revenue=revenue)
+                for (day, status, payment_method, dish), (orders, quantity, revenue) in compute().items()]
+        DailySales.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def report(start, end):
+    """Sales between ``start`` and ``end`` (dates, inclusive), read from the rollup only."""
+    rows = DailySales.objects.filter(day__gte=start, day__lte=end)
+    whole = rows.filter(dish=WHOLE_ORDER)
+    sold = ~Q(status='cancelled')
+    statuses = dict(Order.STATUS_CHOICES)
+    methods = dict(Order._meta.get_field('payment_method').choices)
+    # Annotation names can't shadow the model's own fields.
+    totals = {'order_count': Sum('orders'), 'dish_count': Sum('quantity'), 'takings': Sum('revenue')}
+    by_status = list(whole.values('status').annotate(**totals).order_by('status'))
+    by_method = list(whole.filter(sold).values('payment_method').annotate(**totals).order_by('payment_method'))
+    for row in by_status:
+        row['label'] = statuses.get(row['status'], row['status'])
+    for row in by_method:
+        row['label'] = methods.get(row['payment_method'], row['payment_method'])
+    return {
+        'totals': whole.filter(sold).aggregate(**totals),
+        'days': list(whole.values('day').annotate(
+            order_count=Sum('orders', filter=sold), cancelled=Sum('orders', filter=~sold),
+            dish_count=Sum('quantity', filter=sold), takings=Sum('revenue', filter=sold)).order_by('-day')),
+        'statuses': by_status,
+        'payment_methods': by_method,
+        'dishes': list(rows.filter(sold).exclude(dish=WHOLE_ORDER).values('dish').annotate(**totals).order_by('-takings', 'dish')),
+    }
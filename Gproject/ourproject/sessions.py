@@ -0,0 +1,100 @@
+"""Session storage for SESSION_MODE=cached_db, and purging expired sessions.
+
+``SessionStore`` is Django's cached_db backend with a shorter cache lifetime. Stock
+cached_db keeps each session in the cache for its whole 30-day age. With a per-process
+cache (LocMemCache, the default) a logout in one worker would never reach the copies other
+workers hold. Here a cached copy lives at most SESSION_CACHE_TIMEOUT seconds, after which
+it is re-read from django_session.
+
+``purge`` deletes expired rows from django_session in small batches, so it never holds the
+write lock for long. ``manage.py purge_sessions`` runs it from cron. With
+SESSION_PURGE_INTERVAL set, ``schedule`` (connected to request_finished) also runs it in a
+background thread of each worker, at most once per interval.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.models import Session
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+_last_purge = None
+_purge_lock = threading.Lock()
+
+
+class _CappedCache:
+    """A cache whose ``set``/``aset`` timeouts never exceed ``timeout``."""
+
+    def __init__(self, cache, timeout):
+        self.cache = cache
+        self.timeout = timeout
+
+    def __getattr__(self, name):
+        return getattr(self.cache, name)
+
+    def __contains__(self, key):
+        return key in self.cache
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, min(timeout, self.timeout))
+
+    async def aset(self, key, value, timeout):
+        await self.cache.aset(key, value, min(timeout, self.timeout))
+
+
+class SessionStore(cached_db.SessionStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = _CappedCache(self._cache, settings.SESSION_CACHE_TIMEOUT)
+
+
+def expired(now=None):
+    return Session.objects.filter(expire_date__lt=now or timezone.now())
+
+
+def purge(batch_size=BATCH_SIZE, pause=0.0, limit=None):
+    """Delete expired sessions ``batch_size`` rows per statement; return how many went."""
+    now = timezone.now()
+    deleted = 0
+    while limit is None or deleted < limit:
+        size = batch_size if limit is None else min(batch_size, limit - deleted)
+        keys = list(expired(now).values_list('session_key', flat=True)[:size])
+        if keys:
+            Session.objects.filter(session_key__in=keys).delete()
+        deleted += len(keys)
+        if len(keys) < size:
+            break
+        time.sleep(pause)
+    return deleted
+
+
+def _purge_in_background():
+    try:
+        count = purge(pause=0.05)
+        if count:
+            logger.info('Purged %d expired sessions', count)
+    except DatabaseError:
+        logger.exception('Purging expired sessions failed')
+    finally:
+        connection.close()
+        _purge_lock.release()
+
+
+def schedule(**kwargs):
+    """request_finished receiver: start a background purge if one is due."""
+    global _last_purge
+    interval = settings.SESSION_PURGE_INTERVAL
+    now = time.monotonic()
+    if not interval or (_last_purge is not None and now - _last_purge < interval):
+        return
+    if not _purge_lock.acquire(blocking=False):
+        return
+    _last_purge = now
+    threading.Thread(target=_purge_in_background, name='session-purge', daemon=True).start()
@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import feed, images, live, sales
+from .catalog import bump_version
+from .context_processors import invalidate_reception_flag
+from .models import MenuItem, Order, OrderTombstone, Profile
+
+# Sent once per batch when orders change through a queryset UPDATE, which bypasses
+# post_save. Arguments: ids (list of order ids), changes (dict of field -> new value).
+orders_changed = Signal()
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(orders_changed, sender=Order)
+def refresh_reception_flag(sender, **kwargs):
+    # Wait for the commit so a concurrent render cannot re-cache the pre-commit state.
+    transaction.on_commit(invalidate_reception_flag)
+
+
+@receiver(post_save, sender=Order)
+def publish_order_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: live.publish('order.created', live.order_created(instance)), robust=True)
+    else:
+        data = live.order_changed([instance.pk], {field: getattr(instance, field) for field in live.CHANGE_FIELDS})
+        transaction.on_commit(lambda: live.publish('order.changed', data), robust=True)
+
+
+@receiver(post_delete, sender=Order)
+def record_order_tombstone(sender, instance, **kwargs):
+    # Same transaction as the delete, so the order feed never misses one.
+    OrderTombstone.objects.create(order_id=instance.pk)
+    transaction.on_commit(feed.purge_if_due)
+
+
+@receiver(pre_delete, sender=Order)
+def remove_order_from_sales(sender, instance, **kwargs):
+    # Before the lines are cascaded away; same transaction as the delete.
+    sales.record([sales.snapshot(instance, instance.lines.all())], -1)
+
+
+@receiver(post_delete, sender=Order)
+def publish_order_deleted(sender, instance, **kwargs):
+    ids = [instance.pk]
+    transaction.on_commit(lambda: live.publish('order.deleted', {'ids': ids}), robust=True)
+
+
+@receiver(orders_changed, sender=Order)
+def publish_orders_changed(sender, ids, changes, **kwargs):
+    data = live.order_changed(ids, changes)
+    transaction.on_commit(lambda: live.publish('order.changed', data), robust=True)
+
+
+# Connected before refresh_menu_catalog, so its commit hook runs first and the new
+# catalog already has the renditions.
+@receiver(post_save, sender=MenuItem)
+def build_menu_image_renditions(sender, instance, **kwargs):
+    images.refresh_on_commit(instance, 'image', 'image_renditions')
+
+
+@receiver(post_save, sender=Profile)
+def build_avatar_renditions(sender, instance, **kwargs):
+    images.refresh_on_commit(instance, 'avatar', 'avatar_renditions')
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def refresh_menu_catalog(sender, **kwargs):
+    transaction.on_commit(bump_version)
@@ -1,5 +1,13 @@
 
 document.addEventListener("DOMContentLoaded", function () {
+  // Cached pages leave the signed-in header links to be filled in per visitor
+  document.querySelectorAll("[data-auth-fragment]").forEach(slot => {
+    fetch(slot.dataset.authFragment, { credentials: "same-origin" })
+      .then(res => res.ok ? res.text() : null)
+      .then(html => { if (html) slot.outerHTML = html; })
+      .catch(() => {});
+  });
+
   // Mobile nav toggle
   const navToggle = document.querySelector(".nav-toggle");
   const nav = document.querySelector(".nav");
@@ -25,8 +33,19 @@ document.addEventListener("DOMContentLoaded", function () {
   }
 
   const CART_KEY = "project_cart_v1";
+  // One Idempotency-Key per cart: retries and double-taps of the same checkout reuse it,
+  // so the server places the order once. Changing the cart starts a new one.
+  const ORDER_KEY = "project_order_key_v1";
   function getCart() { try { return JSON.parse(localStorage.getItem(CART_KEY) || "[]"); } catch (e) { return [] } }
-  function saveCart(c) { localStorage.setItem(CART_KEY, JSON.stringify(c)); renderCart() }
+  function saveCart(c) { localStorage.setItem(CART_KEY, JSON.stringify(c)); localStorage.removeItem(ORDER_KEY); renderCart() }
+  function orderKey() {
+    let key = localStorage.getItem(ORDER_KEY);
+    if (!key) {
+      key = window.crypto && crypto.randomUUID ? crypto.randomUUID() : Date.now() + "-" + Math.random().toString(36).slice(2);
+      localStorage.setItem(ORDER_KEY, key);
+    }
+    return key;
+  }
 
   function renderCart() {
     const cart = getCart();
@@ -99,6 +118,7 @@ document.addEventListener("DOMContentLoaded", function () {
     const checkoutBtn = document.querySelector("#cart-checkout");
     if (clearBtn) clearBtn.addEventListener("click", () => {
       localStorage.removeItem(CART_KEY);
+      localStorage.removeItem(ORDER_KEY);
       renderCart();
     });
     if (checkoutBtn) checkoutBtn.addEventListener("click", () => {
@@ -113,7 +133,8 @@ document.addEventListener("DOMContentLoaded", function () {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
-          'X-CSRFToken': CSRF_TOKEN
+          'X-CSRFToken': CSRF_TOKEN,
+          'Idempotency-Key': orderKey()
         },
         body: JSON.stringify({ items, total })
       })
@@ -121,13 +142,14 @@ document.addEventListener("DOMContentLoaded", function () {
       .then(data => {
         if (data.ok) {
           localStorage.removeItem(CART_KEY);
+          localStorage.removeItem(ORDER_KEY);
           renderCart();
           flashMessage(data.message);
           if (data.redirect) {
             window.location.href = data.redirect;
           }
         } else {
-          flashMessage("Order failed");
+          flashMessage(data.error || "Order failed");
         }
       })
       .catch(() => flashMessage("Order failed"));
@@ -136,6 +158,108 @@ document.addEventListener("DOMContentLoaded", function () {
     renderCart();
   }
 
+  // Bulk order actions on the reception board and admin dashboard
+  document.querySelectorAll(".bulk-actions").forEach(form => {
+    const selectAll = form.querySelector(".bulk-select-all");
+    if (selectAll) selectAll.addEventListener("change", () => {
+      document.querySelectorAll(".bulk-select").forEach(box => { box.checked = selectAll.checked; });
+    });
+    form.addEventListener("submit", (e) => {
+      e.preventDefault();
+      const ids = Array.from(document.querySelectorAll(".bulk-select:checked")).map(box => parseInt(box.value));
+      if (!ids.length) {
+        flashMessage("Select at least one order");
+        return;
+      }
+      const action = form.querySelector("[name=action]").value;
+      const token = form.querySelector("[name=csrfmiddlewaretoken]").value;
+      fetch(form.dataset.bulkUrl, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-CSRFToken': token,
+          'X-Requested-With': 'XMLHttpRequest'
+        },
+        body: JSON.stringify({ action, ids })
+      })
+      .then(response => response.json())
+      .then(data => {
+        if (!data.ok) {
+          flashMessage(data.error || "Bulk update failed");
+          return;
+        }
+        flashMessage(`${data.updated} updated` + (data.failed ? `, ${data.failed} skipped` : ""));
+        setTimeout(() => window.location.reload(), 800);
+      })
+      .catch(() => flashMessage("Bulk update failed"));
+    });
+  });
+
+  // Live order lists: patch rows from the order event stream instead of reloading
+  document.querySelectorAll("[data-live-orders]").forEach(list => {
+    if (!window.EventSource) return;
+    const template = list.querySelector("template");
+    const empty = list.parentElement.querySelector("[data-live-empty]");
+    const limit = parseInt(list.dataset.liveLimit || "50");
+    const ownerId = list.dataset.liveUser ? parseInt(list.dataset.liveUser) : null;
+    const rows = () => Array.from(list.querySelectorAll(":scope > [data-order-id]"));
+    const badgeClass = { received: "received", cancelled: "cancelled" };
+
+    function fill(row, data) {
+      row.querySelectorAll("[data-live-field]").forEach(el => {
+        const value = data[el.dataset.liveField];
+        if (value === undefined) return;
+        const max = parseInt(el.dataset.liveTruncate || "0");
+        el.textContent = max && String(value).length > max ? String(value).slice(0, max - 1) + "…" : value;
+      });
+      if (data.status) {
+        row.querySelectorAll("[data-live-badge]").forEach(el => {
+          el.className = `status-badge status-${badgeClass[data.status] || "pending"}`;
+        });
+        row.querySelectorAll("[data-live-when]").forEach(el => { el.hidden = el.dataset.liveWhen !== data.status; });
+      }
+    }
+
+    function renumber() {
+      rows().forEach((row, i) => row.querySelectorAll('[data-live-field="number"]').forEach(el => { el.textContent = i + 1; }));
+      if (empty) empty.hidden = rows().length > 0;
+    }
+
+    const source = new EventSource(list.dataset.liveOrders);
+    source.addEventListener("order.created", (e) => {
+      const order = JSON.parse(e.data);
+      if (!template || (ownerId !== null && order.user_id !== ownerId)) return;
+      if (list.querySelector(`:scope > [data-order-id="${order.id}"]`)) return;
+      const row = template.content.firstElementChild.cloneNode(true);
+      row.dataset.orderId = order.id;
+      row.querySelectorAll("form[action]").forEach(form => {
+        form.setAttribute("action", form.getAttribute("action").replace("/0/", `/${order.id}/`));
+      });
+      row.querySelectorAll(".bulk-select").forEach(box => {
+        box.value = order.id;
+        box.setAttribute("aria-label", `Select order ${order.id}`);
+      });
+      fill(row, order);
+      list.insertBefore(row, list.firstElementChild);
+      rows().slice(limit).forEach(old => old.remove());
+      renumber();
+    });
+    source.addEventListener("order.changed", (e) => {
+      const { ids, changes } = JSON.parse(e.data);
+      ids.forEach(id => {
+        const row = list.querySelector(`:scope > [data-order-id="${id}"]`);
+        if (row) fill(row, changes);
+      });
+    });
+    source.addEventListener("order.deleted", (e) => {
+      JSON.parse(e.data).ids.forEach(id => {
+        const row = list.querySelector(`:scope > [data-order-id="${id}"]`);
+        if (row) row.remove();
+      });
+      renumber();
+    });
+  });
+
   // Simple flash message
   function flashMessage(txt) {
     let el = document.querySelector("#flash-msg");
@@ -158,6 +282,18 @@ document.addEventListener("DOMContentLoaded", function () {
     setTimeout(() => { el.style.transition = "opacity .6s"; el.style.opacity = "0"; }, 1400);
   }
 
+  // Sign-up form: the admin code field only applies to the admin role
+  const adminCode = document.getElementById("admin-code-group");
+  if (adminCode) {
+    const radios = document.querySelectorAll('input[name="role"]');
+    const update = () => {
+      const selected = document.querySelector('input[name="role"]:checked');
+      adminCode.style.display = selected && selected.value === "super_admin" ? "block" : "none";
+    };
+    radios.forEach(r => r.addEventListener("change", update));
+    update();
+  }
+
   // small enhancement: make images lazy and responsive (if present)
   document.querySelectorAll("img").forEach(img => {
     if (!img.hasAttribute("loading")) img.setAttribute("loading", "lazy");
@@ -0,0 +1,23 @@
+"""``{% bundle %}``: the <link> or <script> tags for a CSS/JS bundle, see storage.py.
+
+    {% load bundles %}
+    {% bundle 'styles/site.bundle.css' %}
+    {% bundle 'js/site.bundle.js' %}
+"""
+from django import template
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html_join
+
+from ..storage import BUNDLES, BundledStaticFilesStorage
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """The hashed bundle once collectstatic has built it, else its source files one by one."""
+    files = [name] if isinstance(staticfiles_storage, BundledStaticFilesStorage) else BUNDLES[name]
+    if name.endswith('.css'):
+        return format_html_join('\n  ', '<link rel="stylesheet" href="{}">', ((static(f),) for f in files))
+    return format_html_join('\n  ', '<script defer src="{}"></script>', ((static(f),) for f in files))
@@ -0,0 +1,28 @@
+"""``{% picture %}``: an image as <picture> with WebP/JPEG srcsets, see images.py.
+
+    {% load pictures %}
+    {% picture item.picture sizes="64px" alt=item.name %}
+    {% picture 'images/jholmomo.jpg' sizes="(max-width: 980px) 100vw, 50vw" alt="dish" %}
+    {% picture profile.avatar renditions=profile.avatar_renditions sizes="150px" alt="Avatar" %}
+"""
+from django import template
+
+from .. import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('partials/picture.html')
+def picture(image, sizes='', alt='', css_class='', style='', loading='lazy', renditions=None):
+    """``image`` is catalog picture data, a static path, or an uploaded image with its renditions."""
+    if isinstance(image, str):
+        image = images.for_static(image)
+    elif not isinstance(image, dict):
+        image = images.for_field(image, renditions)
+    return {'pic': image, 'sizes': sizes, 'alt': alt, 'css_class': css_class, 'style': style, 'loading': loading}
+
+
+@register.simple_tag
+def rendition_url(path, width, fmt='jpeg'):
+    """URL of a static image's rendition up to ``width`` wide, for CSS backgrounds."""
+    return images.static_url(path, width, fmt)
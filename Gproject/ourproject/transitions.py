@@ -0,0 +1,153 @@
+"""Order state machine.
+
+Every status and payment change is declared in ``TRANSITIONS`` and applied as a guarded
+``UPDATE ... WHERE <field> IN (<allowed sources>)``: only the changed columns are written,
+and the affected row count says whether the transition applied. Two admins racing to
+cancel and receive the same order cannot both win. Nothing is read first: a change of
+status or payment method is also pinned to the value it replaces and returns the rows it
+changed (``UPDATE ... RETURNING``), so the sales rollup moves exactly the orders that the
+UPDATE did.
+"""
+import itertools
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, transaction
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+
+from . import sales
+from .models import Order
+from .signals import orders_changed
+
+Transition = namedtuple('Transition', 'field sources target')
+
+TRANSITIONS = {
+    'mark_received': Transition('status', ('on_the_way',), 'received'),
+    'cancel': Transition('status', ('on_the_way',), 'cancelled'),
+    # Choosing cash keeps the order unpaid until staff collect the money at the counter.
+    'choose_cash': Transition('payment_status', ('unpaid',), 'unpaid'),
+    # Re-submitting while pending only replaces the transaction reference.
+    'submit_payment': Transition('payment_status', ('unpaid', 'pending_verification'), 'pending_verification'),
+    'mark_paid': Transition('payment_status', ('unpaid', 'pending_verification'), 'paid'),
+}
+
+BULK_ACTIONS = ('mark_received', 'cancel', 'mark_paid')
+
+MAX_BULK_ORDERS = 500
+
+# What a rollup-moving UPDATE returns of each order it changed.
+RETURNING = ('id', 'created_at', 'total') + sales.DIMENSIONS
+
+
+def _guarded(order_id, name, extra, filters):
+    field, sources, target = TRANSITIONS[name]
+    changes = {field: target, **(extra or {})}
+    return Order.objects.filter(pk=order_id, **{f'{field}__in': sources}, **filters), changes
+
+
+def _pins(name, changes):
+    """The old values to pin a rollup-moving UPDATE to, one dict per UPDATE to try.
+
+    An UPDATE can't return the values it replaced, so each status or payment method it
+    changes is required in the WHERE clause: one of the transition's sources, or each
+    choice in turn when the change comes in ``extra``.
+    """
+    field, sources, _ = TRANSITIONS[name]
+    options = []
+    for dimension in sales.DIMENSIONS:
+        if dimension in changes:
+            values = sources if dimension == field else [value for value, _ in Order._meta.get_field(dimension).choices]
+            options.append([(dimension, value) for value in values])
+    return [dict(pins) for pins in itertools.product(*options)]
+
+
+def _update_returning(queryset, values):
+    """``queryset.update(**values)``, returning each changed row's ``RETURNING`` columns as a dict."""
+    # QuerySet.update() only returns a row count; SQLite 3.35+ and PostgreSQL both take RETURNING.
+    query = queryset.query.chain(UpdateQuery)
+    query.add_update_values(values)
+    compiler = query.get_compiler(queryset.db)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:  # e.g. pk__in=[]
+        return []
+    columns = [Order._meta.get_field(name).get_col(Order._meta.db_table) for name in RETURNING]
+    returning = ', '.join(compiler.compile(column)[0] for column in columns)
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {returning}', params)
+        rows = cursor.fetchall()
+    converters = compiler.get_converters(columns)
+    if converters:
+        rows = compiler.apply_converters(rows, converters)
+    return [dict(zip(RETURNING, row)) for row in rows]
+
+
+def apply(order_id, name, *, extra=None, **filters):
+    """Apply transition ``name`` to one order and return whether it applied.
+
+    ``extra`` holds additional columns written with the transition (payment method,
+    transaction reference); ``filters`` narrow the guard further, e.g. ``user=request.user``.
+    """
+    queryset, changes = _guarded(order_id, name, extra, filters)
+    if not sales.affected(changes):
+        applied = queryset.update(updated_at=timezone.now(), **changes) == 1
+    else:
+        applied = False
+        with transaction.atomic():
+            for pins in _pins(name, changes):
+                rows = _update_returning(queryset.filter(**pins), {'updated_at': timezone.now(), **changes})
+                if rows:
+                    sales.move(sales.before(rows, pins), changes)
+                    applied = True
+                    break
+    if applied:
+        orders_changed.send(sender=Order, ids=[order_id], changes=changes)
+    return applied
+
+
+async def aapply(order_id, name, *, extra=None, **filters):
+    """Async ``apply`` for async views."""
+    queryset, changes = _guarded(order_id, name, extra, filters)
+    if sales.affected(changes):
+        return await sync_to_async(apply)(order_id, name, extra=extra, **filters)  # needs a transaction
+    applied = await queryset.aupdate(updated_at=timezone.now(), **changes) == 1
+    if applied:
+        # Receivers queue their work with transaction.on_commit, which needs the sync connection.
+        await sync_to_async(orders_changed.send)(sender=Order, ids=[order_id], changes=changes)
+    return applied
+
+
+def apply_bulk(name, order_ids):
+    """Apply transition ``name`` to every order in ``order_ids`` with guarded UPDATEs.
+
+    Returns ``{order_id: {'ok': bool, 'error': str}}``. Orders that are missing or not in
+    an allowed source state are left untouched and reported as failures.
+    """
+    field, sources, target = TRANSITIONS[name]
+    ids = list(dict.fromkeys(order_ids))
+    changes = {field: target}
+    eligible = Order.objects.filter(pk__in=ids, **{f'{field}__in': sources})
+    done = set()
+    with transaction.atomic():
+        for pins in _pins(name, changes):
+            rows = _update_returning(eligible.filter(**pins).exclude(pk__in=done), {'updated_at': timezone.now(), **changes})
+            if pins:
+                sales.move(sales.before(rows, pins), changes)
+            done.update(row['id'] for row in rows)
+        applied = [pk for pk in ids if pk in done]
+        if applied:
+            orders_changed.send(sender=Order, ids=applied, changes=changes)
+
+    missed = [pk for pk in ids if pk not in done]
+    current = dict(Order.objects.filter(pk__in=missed).values_list('pk', field)) if missed else {}
+    results = {}
+    for pk in ids:
+        if pk in done:
+            results[pk] = {'ok': True}
+        elif pk not in current:
+            results[pk] = {'ok': False, 'error': 'Order not found'}
+        else:
+            results[pk] = {'ok': False, 'error': f'Order is {current[pk]}'}
+    return results
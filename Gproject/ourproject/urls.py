@@ -7,6 +7,7 @@ urlpatterns = [
     path('order/', views.order, name='order'),
     path('reception/', views.reception, name='reception'),
     path('aboutus/', views.aboutus, name='aboutus'),
+    path('fragments/auth/', views.auth_fragment, name='auth_fragment'),
     path('accounts/', views.signup_view, name='accounts'),
     path('accounts/profile/', views.profile, name='profile'),
     path('profile/<str:username>/', views.public_profile, name='public_profile'),
@@ -14,6 +15,8 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard/admin/', views.admin_dashboard, name='admin_dashboard'),
+    path('dashboard/admin/sales/', views.sales_report, name='sales_report'),
+    path('dashboard/admin/export/', views.order_export, name='order_export'),
     path('dashboard/admin/toggle-staff/<int:user_id>/', views.toggle_staff, name='toggle_staff'),
     path('dashboard/admin/update-order/<int:order_id>/<str:status>/', views.update_order_status, name='update_order_status'),
     path('dashboard/customer/', views.customer_dashboard, name='customer_dashboard'),
@@ -23,4 +26,8 @@ urlpatterns = [
     path('api/mark-paid/<int:order_id>/', views.mark_paid, name='mark_paid'),
     path('api/cancel-order/<int:order_id>/', views.cancel_order, name='cancel_order'),
     path('api/delete-order/<int:order_id>/', views.delete_order, name='delete_order'),
+    path('api/orders/bulk/', views.bulk_order_action, name='bulk_order_action'),
+    path('api/orders/events/', views.order_events, name='order_events'),
+    path('api/orders/feed/', views.order_feed, name='order_feed'),
+    path('metrics', views.metrics, name='metrics'),
 ]
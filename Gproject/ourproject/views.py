@@ -6,12 +6,22 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages  
 from django import forms 
 from django.contrib.auth.models import User  
-from django.http import JsonResponse, HttpResponseBadRequest  
+from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest, HttpResponseNotModified, StreamingHttpResponse  
 from django.conf import settings  
 from django.views.decorators.http import require_POST  
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import never_cache
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.http import parse_etags, quote_etag
+from django.db import IntegrityError, transaction
+from asgiref.sync import sync_to_async
+from datetime import timedelta
 import json
-from .models import Order, Profile, MenuItem
+from .models import Order, OrderLine, Profile
+from .ratelimit import ratelimit
+from . import archive, catalog, export, feed, idempotency, live, metrics as request_metrics, pagecache, sales, transitions
 
 
 class UserForm(forms.ModelForm):
@@ -46,7 +56,7 @@ def profile(request):
 
 def public_profile(request, username):
     try:
-        profile_user = User.objects.get(username=username)
+        profile_user = User.objects.select_related('profile').get(username=username)
         profile = profile_user.profile
         return render(request, 'public_profile.html', {'profile_user': profile_user, 'profile': profile})
     except User.DoesNotExist:
@@ -81,31 +91,26 @@ class SignupForm(UserCreationForm):
 
 
 # Page views
+@pagecache.cached_page
 def index(request):
     return render(request, 'index.html')
 
 
+@pagecache.cached_page
 def menu(request):
-    menu_items = MenuItem.objects.filter(available=True)
-    # Map item names to image files
-    image_map = {
-        'Ema Datshi': 'emadatsi.jpg',
-        'Fried Momo': 'fried momo.avif',
-        'Sikam Datshi': 'sikam datsi.jpg',
-        'Kewa Datshi': 'kewa datsi.png',
-        'Vegetable Curry': 'vegetablecurry.jpg',
-        'Chicken Fried Rice': 'chicken.jpg',
-        'Spicy Noodles': 'spicy.jpg',
-        'Seasonal Salad': 'salad.jpg',
-    }
-    for item in menu_items:
-        item.image_url = image_map.get(item.name, 'default.jpg')
-    return render(request, 'menu.html', {'menu_items': menu_items})
+    return render(request, 'menu.html', _menu_context())
+
+
+def _menu_context():
+    # The catalog is passed uncalled: the template only calls it when the
+    # fragment cache for this menu version is cold.
+    return {'menu_items': catalog.get_catalog, 'menu_version': catalog.version(),
+            'menu_fragment_timeout': settings.MENU_CACHE_TIMEOUT}
 
 
 @login_required
 def order(request):
-    return render(request, 'order.html')
+    return render(request, 'order.html', _menu_context())
 
 
 def reception(request):
@@ -117,24 +122,29 @@ def reception(request):
             order_id = request.POST.get('order_id')
             payment_method = request.POST.get('payment_method')
             if order_id and payment_method in ['qr_payment', 'cash']:
-                try:
-                    order = Order.objects.get(pk=order_id, user=request.user, payment_status='unpaid')
-                    order.payment_method = payment_method
-                    if payment_method == 'qr_payment':
-                        order.payment_status = 'pending_verification'
-                    order.save()
-                    messages.success(request, f'Payment method set to {order.get_payment_method_display()}.')
+                name = 'submit_payment' if payment_method == 'qr_payment' else 'choose_cash'
+                if transitions.apply(order_id, name, extra={'payment_method': payment_method},
+                                     user=request.user, payment_status='unpaid'):
+                    label = dict(Order._meta.get_field('payment_method').choices)[payment_method]
+                    messages.success(request, f'Payment method set to {label}.')
                     return redirect('reception')
-                except Order.DoesNotExist:
-                    messages.error(request, 'Order not found.')
-    return render(request, 'reception.html', {'orders': orders, 'user_orders': user_orders})
+                messages.error(request, 'Order not found.')
+    return render(request, 'reception.html', {'orders': orders, 'user_orders': user_orders, 'live_orders': live.streams(request)})
 
 
+@pagecache.cached_page
 def aboutus(request):
     return render(request, 'aboutus.html')
 
 
+@never_cache
+def auth_fragment(request):
+    # The per-visitor header links punched out of cached pages.
+    return render(request, 'partials/auth_links.html')
+
+
 # Authentication: combined login / signup page
+@ratelimit('signup', '5/m', key='ip')
 def signup_view(request):
     if request.method == 'POST':
         form = SignupForm(request.POST)
@@ -156,6 +166,7 @@ def signup_view(request):
     return render(request, 'signup.html', {'signup_form': form})
 
 
+@ratelimit('login', '10/m', key='ip')
 def login_view(request):
     form = AuthenticationForm(request)
     if request.method == 'POST':
@@ -190,30 +201,54 @@ def dashboard(request):
 @user_passes_test(_is_admin)
 def admin_dashboard(request):
     users = User.objects.all().order_by('username')
-    orders = Order.objects.order_by('-created_at')[:50]  # recent orders
-    for order in orders:
-        try:
-            items = json.loads(order.items)
-            item_names = [item['title'] for item in items]
-            order.item_names = ', '.join(item_names)
-        except (json.JSONDecodeError, KeyError):
-            order.item_names = order.items
-    return render(request, 'admin_dashboard.html', {'users': users, 'orders': orders})
+    orders = Order.objects.select_related('user').prefetch_related('lines').order_by('-created_at')[:50]  # recent orders
+    return render(request, 'admin_dashboard.html', {'users': users, 'orders': orders, 'live_orders': live.streams(request)})
+
+
+@login_required
+@user_passes_test(_is_admin)
+def sales_report(request):
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 366)
+    except ValueError:
+        days = 30
+    end = timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    context = sales.report(start, end)
+    context.update({'days_shown': days, 'period_choices': (7, 30, 90, 365), 'start': start, 'end': end})
+    return render(request, 'sales_report.html', context)
+
+
+@login_required
+@user_passes_test(_is_admin)
+def order_export(request):
+    """Stream the orders matching the query's filters as CSV or, with ?format=ndjson, NDJSON."""
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest('format must be csv or ndjson')
+    try:
+        filters = export.parse_filters(request.GET)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    chunks = export.astream(filters, fmt) if isinstance(request, ASGIRequest) else export.stream(filters, fmt)
+    response = StreamingHttpResponse(chunks, content_type=export.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="orders-{timezone.localdate():%Y%m%d}.{fmt}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @require_POST
 @login_required
 @user_passes_test(_is_admin)
 def update_order_status(request, order_id, status):
-    try:
-        order = Order.objects.get(pk=order_id)
-        if status in ['received', 'cancelled']:
-            order.status = status
-            order.save()
-            messages.success(request, f'Order {order.id} marked as {status}.')
-        else:
-            messages.error(request, 'Invalid status.')
-    except Order.DoesNotExist:
+    names = {'received': 'mark_received', 'cancelled': 'cancel'}
+    if status not in names:
+        messages.error(request, 'Invalid status.')
+    elif transitions.apply(order_id, names[status]):
+        messages.success(request, f'Order {order_id} marked as {status}.')
+    elif Order.objects.filter(pk=order_id).exists():
+        messages.error(request, f'Order {order_id} can no longer be marked as {status}.')
+    else:
         messages.error(request, 'Order not found.')
     return redirect('admin_dashboard')
 
@@ -242,93 +277,219 @@ def toggle_staff(request, user_id):
 
 @login_required
 def customer_dashboard(request):
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')[:10]
-    return render(request, 'customer_dashboard.html', {'orders': orders})
+    orders = archive.customer_history(request.user, 10)
+    return render(request, 'customer_dashboard.html', {'orders': orders, 'live_orders': live.streams(request)})
 
 
 @csrf_exempt
 @require_POST
-def place_order(request):
+@ratelimit('place_order', '10/m')
+@ratelimit('place_order_ip', '60/m', key='ip')
+async def place_order(request):
     # Require authenticated customer with a display name
-    if not request.user.is_authenticated:
+    user = await request.auser()
+    if not user.is_authenticated:
         return JsonResponse({'ok': False, 'error': 'Please log in or create an account before ordering.'}, status=403)
-    display_name = (request.user.first_name or '').strip()
+    display_name = (user.first_name or '').strip()
     if not display_name:
         return JsonResponse({'ok': False, 'error': 'Please set your display name in your profile before ordering.'}, status=400)
+    try:
+        idempotency_key = idempotency.get_key(request)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    digest = idempotency.fingerprint(request.body) if idempotency_key else ''
+    if idempotency_key:
+        # A retry of a checkout that already went through gets the same answer, and no new order.
+        record = await idempotency.alookup(user, idempotency_key)
+        if record is not None:
+            return idempotency.replay(record, digest)
     try:
         payload = json.loads(request.body.decode('utf-8'))
     except Exception:
         return HttpResponseBadRequest('Invalid JSON')
     items = payload.get('items', [])
-    total = payload.get('total', 0)
-    user = request.user
-    order = Order.objects.create(user=user, items=json.dumps(items), total=total, status='on_the_way', payment_status='unpaid')
-    return JsonResponse({'ok': True, 'order_id': order.id, 'redirect': f'/qr-payment/{order.id}/', 'message': 'Order placed. Proceed to payment.'})
-
-
-def qr_payment(request, order_id):
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return HttpResponseBadRequest('Invalid items')
+    if not items:
+        return JsonResponse({'ok': False, 'error': 'Your cart is empty.'}, status=400)
+    # Prices and the total come from the menu, never from the browser.
+    prices = await catalog.aprice_index()
+    lines = []
+    for item in items:
+        try:
+            qty = max(1, int(item.get('qty', 1)))
+            menu_id = int(item['id']) if item.get('id') is not None else None
+        except (TypeError, ValueError):
+            return HttpResponseBadRequest('Invalid items')
+        entry = prices.lookup(menu_id=menu_id, name=str(item.get('title', '')))
+        if entry is None:
+            return JsonResponse({'ok': False, 'error': f'{item.get("title") or "An item"} is not on the menu.'}, status=400)
+        menu_id, title, price, available = entry
+        if not available:
+            return JsonResponse({'ok': False, 'error': f'{title} is currently unavailable.'}, status=400)
+        lines.append(OrderLine(menu_item_id=menu_id, title=title, unit_price=price, qty=qty))
+    total = sum(line.line_total for line in lines)
+    return await _create_order(user, total, lines, idempotency_key, digest)
+
+
+@sync_to_async
+def _create_order(user, total, lines, idempotency_key=None, digest=''):
+    # Django has no async transactions, so the order and its lines are written in one sync call.
     try:
-        order = Order.objects.get(pk=order_id)
-    except Order.DoesNotExist:
-        return redirect('index')
+        with transaction.atomic():
+            order = Order.objects.create(user=user, total=total, status='on_the_way', payment_status='unpaid')
+            for line in lines:
+                line.order = order
+            OrderLine.objects.bulk_create(lines)
+            sales.record([sales.snapshot(order, lines)])
+            placed = {'ok': True, 'order_id': order.id, 'total': str(total), 'redirect': f'/qr-payment/{order.id}/', 'message': 'Order placed. Proceed to payment.'}
+            if idempotency_key:
+                # Last, so a concurrent attempt with the same key fails here and rolls its order back.
+                idempotency.store(user, idempotency_key, digest, placed)
+    except IntegrityError:
+        record = idempotency.lookup(user, idempotency_key) if idempotency_key else None
+        if record is None:
+            raise
+        return idempotency.replay(record, digest)
+    if idempotency_key:
+        idempotency.purge_if_due()
+    return JsonResponse(placed)
+
+
+@ratelimit('qr_payment', '10/m')
+async def qr_payment(request, order_id):
     if request.method == 'POST':
         transaction_ref = request.POST.get('transaction_ref', '').strip()
-        order.payment_method = 'qr_payment'
-        order.payment_status = 'pending_verification'
-        order.transaction_ref = transaction_ref if transaction_ref else None
-        order.save()
-        messages.success(request, 'Payment submitted for verification. Please wait in reception.')
+        extra = {'payment_method': 'qr_payment', 'transaction_ref': transaction_ref if transaction_ref else None}
+        if await transitions.aapply(order_id, 'submit_payment', extra=extra):
+            messages.success(request, 'Payment submitted for verification. Please wait in reception.')
+            return redirect('reception')
+        if not await Order.objects.filter(pk=order_id).aexists():
+            return redirect('index')
+        messages.error(request, 'This order has already been paid.')
         return redirect('reception')
-    return render(request, 'qr_payment.html', {'order': order})
+    order = await Order.objects.filter(pk=order_id).afirst()
+    if order is None:
+        return redirect('index')
+    # Context processors and the template touch the session and user synchronously.
+    return await sync_to_async(render)(request, 'qr_payment.html', {'order': order})
+
+
+async def _transition_failed(order_id, error):
+    # Only reached when the guarded UPDATE matched nothing; tell a missing order apart from a wrong state.
+    if not await Order.objects.filter(pk=order_id).aexists():
+        return JsonResponse({'ok': False, 'error': 'Order not found'}, status=404)
+    return JsonResponse({'ok': False, 'error': error}, status=400)
 
 
 @require_POST
 @login_required
-def mark_received(request, order_id):
-    if not _is_admin(request.user):
+async def mark_received(request, order_id):
+    if not _is_admin(await request.auser()):
         return JsonResponse({'ok': False, 'error': 'Unauthorized'}, status=403)
-    try:
-        order = Order.objects.get(pk=order_id)
-    except Order.DoesNotExist:
-        return JsonResponse({'ok': False, 'error': 'Order not found'}, status=404)
-    order.status = 'received'
-    order.save()
+    if not await transitions.aapply(order_id, 'mark_received'):
+        return await _transition_failed(order_id, 'Order cannot be marked as received.')
     # If this was submitted from a normal form POST, redirect back to reception
     if request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
-        return JsonResponse({'ok': True, 'order_id': order.id, 'message': 'Order marked as received.'})
+        return JsonResponse({'ok': True, 'order_id': order_id, 'message': 'Order marked as received.'})
     return redirect('reception')
 
 
 @require_POST
-def mark_paid(request, order_id):
-    if not _is_admin(request.user):
+async def mark_paid(request, order_id):
+    if not _is_admin(await request.auser()):
         return JsonResponse({'ok': False, 'error': 'Unauthorized'}, status=403)
-    try:
-        order = Order.objects.get(pk=order_id)
-        order.payment_status = 'paid'
-        order.save()
-        return JsonResponse({'ok': True, 'order_id': order.id, 'message': 'Order marked as paid.'})
-    except Order.DoesNotExist:
-        return JsonResponse({'ok': False, 'error': 'Order not found'}, status=404)
+    if not await transitions.aapply(order_id, 'mark_paid'):
+        return await _transition_failed(order_id, 'Order is already paid.')
+    return JsonResponse({'ok': True, 'order_id': order_id, 'message': 'Order marked as paid.'})
 
 
 @require_POST
 @login_required
-def cancel_order(request, order_id):
+async def cancel_order(request, order_id):
+    if not _is_admin(await request.auser()):
+        return JsonResponse({'ok': False, 'error': 'Unauthorized'}, status=403)
+    # Only orders that are on the way can be cancelled
+    if not await transitions.aapply(order_id, 'cancel'):
+        return await _transition_failed(order_id, 'Order cannot be cancelled.')
+    if request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
+        return JsonResponse({'ok': True, 'order_id': order_id, 'message': 'Order cancelled.'})
+    return redirect('reception')
+
+
+@require_POST
+@login_required
+def bulk_order_action(request):
     if not _is_admin(request.user):
         return JsonResponse({'ok': False, 'error': 'Unauthorized'}, status=403)
     try:
-        order = Order.objects.get(pk=order_id)
-    except Order.DoesNotExist:
-        return JsonResponse({'ok': False, 'error': 'Order not found'}, status=404)
-    # Only allow cancelling orders that are on the way
-    if order.status == 'on_the_way':
-        order.status = 'cancelled'
-        order.save()
-        if request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
-            return JsonResponse({'ok': True, 'order_id': order.id, 'message': 'Order cancelled.'})
-        return redirect('reception')
+        payload = json.loads(request.body.decode('utf-8'))
+        action = payload.get('action')
+        order_ids = [int(pk) for pk in payload.get('ids', [])]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'ok': False, 'error': 'Invalid JSON'}, status=400)
+    if action not in transitions.BULK_ACTIONS:
+        return JsonResponse({'ok': False, 'error': 'Unknown action.'}, status=400)
+    if not order_ids:
+        return JsonResponse({'ok': False, 'error': 'No orders selected.'}, status=400)
+    if len(order_ids) > transitions.MAX_BULK_ORDERS:
+        return JsonResponse({'ok': False, 'error': f'At most {transitions.MAX_BULK_ORDERS} orders per request.'}, status=400)
+    results = transitions.apply_bulk(action, order_ids)
+    updated = sum(1 for result in results.values() if result['ok'])
+    return JsonResponse({
+        'ok': True,
+        'action': action,
+        'updated': updated,
+        'failed': len(results) - updated,
+        'results': {str(pk): result for pk, result in results.items()},
+    })
+
+
+def order_events(request):
+    """Server-Sent Events stream that keeps the reception and dashboard order lists live."""
+    if not live.streams(request):
+        # A sync worker would be held for the whole stream; 204 tells EventSource not to reconnect.
+        return HttpResponse(status=204)
+    viewer = (request.user.pk, request.user.is_superuser)
+    try:
+        last_id = int(request.META.get('HTTP_LAST_EVENT_ID') or request.GET['last_event_id'])
+    except (KeyError, ValueError):
+        last_id = None
+    response = StreamingHttpResponse(live.astream(viewer, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def order_feed(request):
+    """Orders changed since ?cursor=, with tombstones for deleted ones; see feed.py."""
+    if not (_is_admin(request.user) or _has_bearer_token(request, settings.ORDER_FEED_TOKEN)):
+        return JsonResponse({'ok': False, 'error': 'Forbidden'}, status=403)
+    try:
+        cursor = feed.decode_cursor(request.GET.get('cursor'))
+        limit = min(max(int(request.GET.get('limit', settings.ORDER_FEED_PAGE_SIZE)), 1), settings.ORDER_FEED_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'ok': False, 'error': 'Invalid cursor or limit'}, status=400)
+    if feed.expired(cursor):
+        return JsonResponse({'ok': False, 'error': 'Cursor is older than the feed keeps deletions; start again without a cursor',
+                             'resync': True}, status=410)
+    horizon = timezone.now() - timedelta(seconds=settings.ORDER_FEED_SETTLE)
+    etag = quote_etag(feed.etag(cursor, limit, horizon))
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
     else:
-        return JsonResponse({'ok': False, 'error': 'Order cannot be cancelled.'}, status=400)
+        response = JsonResponse({'ok': True, **feed.changes(cursor, limit, horizon)})
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _has_bearer_token(request, token):
+    expected = f'Bearer {token}' if token else None
+    return bool(expected) and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), expected)
 
 
+def metrics(request):
+    if not (_is_admin(request.user) or _has_bearer_token(request, settings.METRICS_TOKEN)):
+        return HttpResponse('Unauthorized', status=403, content_type='text/plain')
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,103 @@
+"""Bytes transferred per page for its HTML, CSS and JS, before and after bundling.
+
+Renders each page twice through django.test.Client:
+
+    source   the plain StaticFilesStorage (as with DEBUG): every CSS/JS source file is
+             requested on its own and served uncompressed
+    bundled  ourproject.storage.BundledStaticFilesStorage, after a collectstatic into a
+             temporary STATIC_ROOT: minified, fingerprinted bundles, sized as served
+             raw, gzip and Brotli
+
+and adds up the sizes of the stylesheets and scripts each page links to:
+
+    python scripts/asset_report.py
+    python scripts/asset_report.py --pages index,menu --json
+
+Images aren't counted (see ``manage.py build_images``). Only pages open to anonymous
+visitors are rendered, so any database with the menu will do.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Gproject.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.staticfiles import finders  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+PAGES = ('index', 'menu', 'aboutus', 'login', 'accounts')
+ASSET = re.compile(r'<(?:link rel="stylesheet" href|script[^>]*? src)="([^"]+)"')
+ENCODINGS = (('raw', ''), ('gzip', '.gz'), ('br', '.br'))
+
+
+def storages(backend):
+    return {**settings.STORAGES, 'staticfiles': {'BACKEND': backend}}
+
+
+def assets(html):
+    return [url for url in ASSET.findall(html) if url.startswith(settings.STATIC_URL)]
+
+
+def measure(pages, locate):
+    """{page: {'html': bytes, 'requests': n, 'raw'|'gzip'|'br': asset bytes}} for the pages."""
+    client = Client()
+    report = {}
+    for page in pages:
+        cache.clear()
+        html = client.get(reverse(page)).content.decode()
+        urls = assets(html)
+        sizes = {encoding: sum(locate(url[len(settings.STATIC_URL):], suffix) for url in urls)
+                 for encoding, suffix in ENCODINGS}
+        report[page] = {'html': len(html.encode()), 'requests': len(urls), **sizes}
+    return report
+
+
+def source_size(name, suffix):
+    # Without the compressing storage there are no .gz/.br files, so every encoding is raw.
+    return os.path.getsize(finders.find(name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', default=','.join(PAGES), help='comma-separated URL names')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+    pages = [page for page in args.pages.split(',') if page]
+
+    with override_settings(STORAGES=storages('django.contrib.staticfiles.storage.StaticFilesStorage'),
+                           ALLOWED_HOSTS=['testserver']):
+        before = measure(pages, source_size)
+
+    with tempfile.TemporaryDirectory() as root:
+        with override_settings(STORAGES=storages('ourproject.storage.BundledStaticFilesStorage'),
+                               STATIC_ROOT=root, ALLOWED_HOSTS=['testserver']):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            after = measure(pages, lambda name, suffix: os.path.getsize(os.path.join(root, name + suffix)))
+
+    if args.json:
+        print(json.dumps({'before': before, 'after': after}, indent=2))
+        return
+    print(f"{'page':<10} {'html':>14} {'requests':>9} {'css+js':>8} {'gzip':>7} {'br':>7} {'total':>16}")
+    for page in pages:
+        b, a = before[page], after[page]
+        print(f"{page:<10} {b['html']:>6} -> {a['html']:>5} {b['requests']:>4} -> {a['requests']}"
+              f" {b['raw']:>8} {a['gzip']:>7} {a['br']:>7} {b['html'] + b['raw']:>7} -> {a['html'] + a['br']:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Concurrency benchmark: parallel place_order writers mixed with reception readers.
+
+Runs the same workload twice, each time on a fresh copy of the database, first with
+Django's stock SQLite setup and then with the tuned one from Gproject/database.py:
+
+    stock  rollback journal, deferred transactions, a new connection per request
+    tuned  WAL, busy_timeout, synchronous=NORMAL, mmap/cache pragmas, BEGIN IMMEDIATE,
+           persistent connections
+
+Every writer and reader is its own process (like gunicorn workers) driving the views
+through django.test.Client. It reports p50/p95/p99 latency and throughput per role, plus
+how many requests failed with "database is locked":
+
+    python scripts/bench_db_concurrency.py --writers 8 --readers 8 --duration 10
+
+Point DATABASE_URL at a seeded SQLite database (see ``manage.py seed_bench``); the
+database itself is only used to set up a bench customer and is then copied.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Gproject.settings')
+# These measure the views, not the rate limits (see scripts/load_abuse.py for those).
+os.environ.setdefault('RATELIMIT_ENABLED', 'False')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import OperationalError, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+HOST = '127.0.0.1'
+PROFILES = ('stock', 'tuned')
+ORDER_BODY = json.dumps({'items': [{'title': 'Ema Datshi', 'qty': 2}, {'title': 'Fried Momo', 'qty': 1}]})
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 2)
+
+
+def worker(role, session_key, deadline, results):
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    client = Client(HTTP_HOST=HOST, raise_request_exception=False)
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    url = reverse('place_order' if role == 'writer' else 'reception')
+    latencies, locked, failed = [], 0, 0
+    while time.monotonic() < deadline:
+        t0 = time.perf_counter()
+        if role == 'writer':
+            response = client.post(url, ORDER_BODY, content_type='application/json')
+        else:
+            response = client.get(url)
+        elapsed = time.perf_counter() - t0
+        if response.status_code < 400:
+            latencies.append(elapsed)
+            continue
+        error = (getattr(response, 'exc_info', None) or (None, None))[1]
+        if isinstance(error, OperationalError) and 'locked' in str(error):
+            locked += 1
+        else:
+            failed += 1
+    results.put((role, latencies, locked, failed))
+
+
+def run_profile(writers, readers, duration, session_key):
+    """Child process entry point: run the workload against this process's DATABASES."""
+    connections.close_all()  # each forked worker opens its own connection
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    deadline = time.monotonic() + duration
+    processes = [context.Process(target=worker, args=(role, session_key, deadline, results))
+                 for role in ['writer'] * writers + ['reader'] * readers]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    summary = {}
+    for role in ('writer', 'reader'):
+        latencies = [t for r, samples, _, _ in collected if r == role for t in samples]
+        summary[role] = {
+            'ok': len(latencies),
+            'locked': sum(locked for r, _, locked, _ in collected if r == role),
+            'failed': sum(failed for r, _, _, failed in collected if r == role),
+            'rps': round(len(latencies) / duration, 1),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else None,
+        }
+    print(json.dumps(summary))
+
+
+def copy_database(source, target, journal_mode):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+        dst.execute(f'PRAGMA journal_mode = {journal_mode}')
+
+
+def bench_session():
+    user, _ = User.objects.get_or_create(username='bench_customer', defaults={'first_name': 'Bench'})
+    if not user.first_name:
+        user.first_name = 'Bench'
+        user.save(update_fields=['first_name'])
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per profile.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    parser.add_argument('--child', choices=PROFILES, help=argparse.SUPPRESS)
+    parser.add_argument('--session', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_profile(args.writers, args.readers, args.duration, args.session)
+        return
+
+    db = settings.DATABASES['default']
+    if db['ENGINE'] != 'django.db.backends.sqlite3':
+        sys.exit('This benchmark compares SQLite configurations; point DATABASE_URL at a SQLite file.')
+    session_key = bench_session()
+    connections.close_all()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for profile in PROFILES:
+            path = os.path.join(workdir, f'{profile}.sqlite3')
+            copy_database(str(db['NAME']), path, 'WAL' if profile == 'tuned' else 'DELETE')
+            env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}', DATABASE_TUNING='on' if profile == 'tuned' else 'off')
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', profile, '--session', session_key, '--writers', str(args.writers),
+                 '--readers', str(args.readers), '--duration', str(args.duration)],
+                env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            results[profile] = json.loads(output.strip().splitlines()[-1])
+            for role, stats in results[profile].items():
+                print(f'{profile:6} {role:7} ok={stats["ok"]:6} locked={stats["locked"]:5} failed={stats["failed"]:4} '
+                      f'rps={stats["rps"]:8} p50={stats["p50_ms"]}ms p95={stats["p95_ms"]}ms p99={stats["p99_ms"]}ms')
+
+    if args.output:
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({'writers': args.writers, 'readers': args.readers,
+                                      'duration': args.duration, 'results': results}, indent=2) + '\n')
+        print(f'Wrote {output}')
+
+
+if __name__ == '__main__':
+    main()
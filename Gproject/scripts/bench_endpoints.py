@@ -0,0 +1,356 @@
+"""Latency/throughput benchmark for every route in ourproject/urls.py.
+
+Drives each route as an anonymous visitor, a customer or the admin, in-process through
+django.test.Client and over HTTP against a locally started gunicorn, and reports
+p50/p95/p99 latency, requests/sec and SQL queries per request. gunicorn runs with sync
+workers (``gunicorn``) and/or with uvicorn workers on the ASGI app (``uvicorn``), using
+gunicorn.conf.py as in production.
+
+Run it against a seeded database (see ``manage.py seed_bench``), e.g.:
+
+    python scripts/bench_endpoints.py --requests 200 --output bench/endpoints.json
+    python scripts/bench_endpoints.py --baseline bench/baseline.json   # exit 1 on regression
+
+Sync vs. async workers at high concurrency, on the same hardware:
+
+    python scripts/bench_endpoints.py --mode gunicorn,uvicorn --concurrency 64 \
+        --routes place_order,qr_payment,mark_received,mark_paid,cancel_order
+
+Signed-in request cost under each SESSION_MODE (the gunicorn workers inherit it):
+
+    for mode in db cached_db signed_cookies; do
+        SESSION_MODE=$mode python scripts/bench_endpoints.py --routes order,dashboard,profile \
+            --output bench/sessions-$mode.json
+    done
+
+Write routes (place_order, the status APIs, delete_order) create their own target orders,
+so run this against a benchmark database, not production data.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from pathlib import Path
+from queue import Queue
+
+project_root = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(project_root))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Gproject.settings')
+# These measure the views, not the rate limits (see scripts/load_abuse.py for those).
+os.environ.setdefault('RATELIMIT_ENABLED', 'False')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+from django.utils.crypto import get_random_string  # noqa: E402
+
+from ourproject import urls as ourproject_urls  # noqa: E402
+from ourproject.models import Order  # noqa: E402
+
+HOST = '127.0.0.1'
+MODES = {'client': None, 'gunicorn': 'wsgi', 'uvicorn': 'asgi'}  # mode -> gunicorn.conf.py SERVER_MODE
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+ORDER_BODY = {'items': [{'title': 'Ema Datshi', 'price': 60, 'qty': 2}, {'title': 'Fried Momo', 'price': 80, 'qty': 1}], 'total': 200}
+
+# role: anonymous | customer | admin | throwaway (a fresh customer session per request, for logout)
+# streaming: an endless or whole-table response; timed to the response headers in client mode, skipped over HTTP
+Route = namedtuple('Route', 'role method kwargs body streaming', defaults=('get', None, None, False))
+
+ROUTES = {
+    'index': Route('anonymous'),
+    'menu': Route('anonymous'),
+    'order': Route('customer'),
+    'reception': Route('customer'),
+    'aboutus': Route('anonymous'),
+    'auth_fragment': Route('customer'),
+    'accounts': Route('anonymous'),
+    'profile': Route('customer'),
+    'public_profile': Route('anonymous', kwargs=lambda b: {'username': b.customer.username}),
+    'login': Route('anonymous'),
+    'logout': Route('throwaway'),
+    'dashboard': Route('customer'),
+    'admin_dashboard': Route('admin'),
+    'sales_report': Route('admin'),
+    'toggle_staff': Route('admin', 'post', kwargs=lambda b: {'user_id': b.customer.pk}),
+    'update_order_status': Route('admin', 'post', kwargs=lambda b: {'order_id': b.new_order(), 'status': 'received'}),
+    'customer_dashboard': Route('customer'),
+    'place_order': Route('customer', 'post', body=lambda b: ORDER_BODY),
+    'qr_payment': Route('customer', kwargs=lambda b: {'order_id': b.new_order()}),
+    'mark_received': Route('admin', 'post', kwargs=lambda b: {'order_id': b.new_order()}),
+    'mark_paid': Route('admin', 'post', kwargs=lambda b: {'order_id': b.new_order()}),
+    'cancel_order': Route('admin', 'post', kwargs=lambda b: {'order_id': b.new_order()}),
+    'delete_order': Route('admin', 'post', kwargs=lambda b: {'order_id': b.new_order()}),
+    'bulk_order_action': Route('admin', 'post', body=lambda b: {'action': 'mark_received', 'ids': [b.new_order() for _ in range(20)]}),
+    'metrics': Route('admin'),
+    'order_events': Route('customer', streaming=True),
+    'order_feed': Route('admin'),
+    'order_export': Route('admin', streaming=True),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, wall, statuses, queries):
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'rps': round(len(latencies) / wall, 1) if wall else None,
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+        'statuses': dict(Counter(str(code) for code in statuses)),
+    }
+
+
+class Bench:
+    def __init__(self, requests, warmup):
+        self.requests = requests
+        self.warmup = warmup
+        self.customer, _ = User.objects.get_or_create(username='bench_customer', defaults={'first_name': 'Bench'})
+        self.admin = (User.objects.filter(is_superuser=True).order_by('pk').first()
+                      or User.objects.create_superuser('bench_admin', password=get_random_string(20)))
+        self.clients = {'anonymous': Client(HTTP_HOST=HOST), 'customer': Client(HTTP_HOST=HOST), 'admin': Client(HTTP_HOST=HOST)}
+        self.clients['customer'].force_login(self.customer)
+        self.clients['admin'].force_login(self.admin)
+
+    def new_order(self):
+        return Order.objects.create(user=self.customer, total=60).pk
+
+    def session_cookie(self, role):
+        client = Client()
+        if role == 'throwaway':
+            client.force_login(self.customer)
+        else:
+            client = self.clients[role]
+        cookie = client.cookies.get(settings.SESSION_COOKIE_NAME)
+        return cookie.value if cookie else None
+
+    def plan(self, name, route, count):
+        """Build every request up front so target orders and sessions are not timed."""
+        requests = []
+        for _ in range(count):
+            url = reverse(name, kwargs=route.kwargs(self) if route.kwargs else None)
+            body = json.dumps(route.body(self)) if route.body else None
+            requests.append((url, body))
+        return requests
+
+    def run_client(self):
+        results = {}
+        for name, route in ROUTES.items():
+            planned = self.plan(name, route, self.warmup + self.requests)
+            latencies, statuses, queries = [], [], []
+            for i, (url, body) in enumerate(planned):
+                client = self.clients.get(route.role)
+                if client is None:
+                    client = Client(HTTP_HOST=HOST)
+                    client.force_login(self.customer)
+                call = getattr(client, route.method)
+                with CaptureQueriesContext(connection) as ctx:
+                    t0 = time.perf_counter()
+                    if body is None:
+                        response = call(url)
+                    else:
+                        response = call(url, body, content_type='application/json')
+                    elapsed = time.perf_counter() - t0
+                if i < self.warmup:
+                    continue
+                latencies.append(elapsed)
+                statuses.append(response.status_code)
+                queries.append(len(ctx.captured_queries))
+            results[name] = summarize(latencies, sum(latencies), statuses, queries)
+            print(f'  client    {name:22} p50={results[name]["p50_ms"]:8.2f}ms p95={results[name]["p95_ms"]:8.2f}ms '
+                  f'q/req={results[name]["queries_per_request"]}')
+        return results
+
+    def run_gunicorn(self, port, workers, concurrency, mode='gunicorn'):
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--bind', f'{HOST}:{port}', '--workers', str(workers), '--log-level', 'warning'],
+            cwd=project_root, env=dict(os.environ, SERVER_MODE=MODES[mode]),
+        )
+        try:
+            wait_for_port(port)
+            results = {}
+            for name, route in ROUTES.items():
+                if route.streaming:
+                    print(f'  {mode:9} {name:22} skipped (streamed)')
+                    continue
+                planned = self.plan(name, route, self.warmup + self.requests)
+                cookies = [self.session_cookie(route.role) for _ in planned] if route.role == 'throwaway' else \
+                    [self.session_cookie(route.role)] * len(planned)
+                jobs = list(zip(planned, cookies))
+                http_run(port, jobs[:self.warmup], concurrency, route.method)
+                latencies, statuses, queries, wall = http_run(port, jobs[self.warmup:], concurrency, route.method)
+                results[name] = summarize(latencies, wall, statuses, queries)
+                print(f'  {mode:9} {name:22} p50={results[name]["p50_ms"]:8.2f}ms p95={results[name]["p95_ms"]:8.2f}ms '
+                      f'rps={results[name]["rps"]} q/req={results[name]["queries_per_request"]}')
+            return results
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def wait_for_port(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(HOST, port, timeout=1)
+            conn.request('GET', '/aboutus/', headers={'Host': HOST})
+            conn.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn did not start on port {port}')
+
+
+def http_run(port, jobs, concurrency, method):
+    """Send ``jobs`` from ``concurrency`` keep-alive connections; return latencies, statuses, queries, wall time."""
+    queue = Queue()
+    for job in jobs:
+        queue.put(job)
+    latencies, statuses, queries = [], [], []
+    lock = threading.Lock()
+    csrf = get_random_string(32)
+
+    def worker():
+        conn = http.client.HTTPConnection(HOST, port, timeout=30)
+        while True:
+            try:
+                (url, body), session = queue.get_nowait()
+            except Exception:
+                break
+            cookie = f'csrftoken={csrf}' + (f'; {settings.SESSION_COOKIE_NAME}={session}' if session else '')
+            headers = {'Host': HOST, 'Cookie': cookie, 'X-CSRFToken': csrf}
+            if body is not None:
+                headers['Content-Type'] = 'application/json'
+            t0 = time.perf_counter()
+            try:
+                conn.request(method.upper(), url, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(HOST, port, timeout=30)
+                with lock:
+                    statuses.append('error')
+                    latencies.append(time.perf_counter() - t0)
+                continue
+            elapsed = time.perf_counter() - t0
+            timing = SERVER_TIMING_QUERIES.search(response.getheader('Server-Timing') or '')
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(response.status)
+                if timing:
+                    queries.append(int(timing.group(1)))
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, queries, time.perf_counter() - started
+
+
+def compare(results, baseline, threshold):
+    """Return human-readable regressions of p95 latency and query counts against ``baseline``."""
+    regressions = []
+    for mode, routes in results['results'].items():
+        for name, current in routes.items():
+            previous = baseline.get('results', {}).get(mode, {}).get(name)
+            if not previous:
+                continue
+            if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + threshold):
+                regressions.append(f'{mode} {name}: p95 {previous["p95_ms"]}ms -> {current["p95_ms"]}ms')
+            if previous.get('queries_per_request') is not None and current.get('queries_per_request') is not None \
+                    and current['queries_per_request'] > previous['queries_per_request']:
+                regressions.append(f'{mode} {name}: queries/request {previous["queries_per_request"]} -> '
+                                   f'{current["queries_per_request"]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', default='client,gunicorn',
+                        help=f'Comma-separated: {", ".join(MODES)} ("both" = client,gunicorn).')
+    parser.add_argument('--requests', type=int, default=100, help='Measured requests per route.')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per route.')
+    parser.add_argument('--concurrency', type=int, default=4, help='Parallel connections in gunicorn mode.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--routes', help='Comma-separated route names to run (default: all).')
+    parser.add_argument('--output', default='bench/endpoints.json')
+    parser.add_argument('--baseline', help='Previous results file to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p95 slowdown before failing (0.25 = 25%%).')
+    args = parser.parse_args()
+    modes = ['client', 'gunicorn'] if args.mode == 'both' else args.mode.split(',')
+    if set(modes) - set(MODES):
+        parser.error(f'unknown mode: {", ".join(sorted(set(modes) - set(MODES)))}')
+
+    missing = {p.name for p in ourproject_urls.urlpatterns} - set(ROUTES)
+    if missing:
+        sys.exit(f'No benchmark route defined for: {", ".join(sorted(missing))}')
+    if args.routes:
+        wanted = set(args.routes.split(','))
+        for name in list(ROUTES):
+            if name not in wanted:
+                del ROUTES[name]
+
+    bench = Bench(args.requests, args.warmup)
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': str(settings.DATABASES['default']['NAME']),
+            'session_mode': settings.SESSION_MODE,
+            'orders': Order.objects.count(),
+            'users': User.objects.count(),
+            'requests_per_route': args.requests,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+        },
+        'results': {},
+    }
+    if 'client' in modes:
+        print('django.test.Client (in-process):')
+        results['results']['client'] = bench.run_client()
+    for mode in ('gunicorn', 'uvicorn'):
+        if mode in modes:
+            print(f'gunicorn, SERVER_MODE={MODES[mode]} ({args.workers} workers, {args.concurrency} connections):')
+            results['results'][mode] = bench.run_gunicorn(args.port, args.workers, args.concurrency, mode)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2) + '\n')
+    print(f'Wrote {output}')
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
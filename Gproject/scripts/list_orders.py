@@ -10,18 +10,9 @@ django.setup()
 
 from ourproject.models import Order
 
-orders = Order.objects.order_by('-created_at')[:20]
-print(f'Found {orders.count()} orders:')
+orders = list(Order.objects.select_related('user').prefetch_related('lines').order_by('-created_at')[:20])
+print(f'Found {len(orders)} orders:')
 for o in orders:
     print(f'ID={o.id} status={o.status} total={o.total} user={o.user} created={o.created_at}')
-    try:
-        items = o.items
-        # items may be JSON string; try to load
-        import json
-        try:
-            items = json.loads(items)
-        except Exception:
-            pass
-    except Exception:
-        items = o.items
+    items = [{'title': line.title, 'price': str(line.unit_price), 'qty': line.qty} for line in o.lines.all()]
     print(' items:', items)
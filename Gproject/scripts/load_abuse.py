@@ -0,0 +1,164 @@
+"""Load test: does the site stay usable while one client abuses the write endpoints?
+
+Starts a local gunicorn (as in production, via gunicorn.conf.py) once with the rate limits
+and load shedding off and once with them on, and for --duration seconds runs:
+
+    abusers   --abusers connections, from one IP, flooding place_order as one customer
+              and POSTing wrong passwords to the login page
+    customer  another customer on another IP browsing the menu and placing an order each
+              second, whose latency and errors are what matter
+
+Clients are told apart by X-Forwarded-For (the server runs with RATELIMIT_PROXY_COUNT=1).
+It reports the customer's p50/p95/p99 latency and failures, and how many of the abusers'
+requests were served, limited (429) or shed (503):
+
+    python scripts/load_abuse.py --duration 20 --abusers 32
+    python scripts/load_abuse.py --mode uvicorn --workers 2
+
+The abusive orders are real, so run it against a benchmark database (``manage.py
+seed_bench``), not production data.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+from bench_endpoints import HOST, MODES, ORDER_BODY, percentile, project_root, wait_for_port
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.utils.crypto import get_random_string  # noqa: E402
+
+ABUSER_IP = '198.51.100.66'
+CUSTOMER_IP = '203.0.113.10'
+
+
+def session_for(username):
+    user, _ = User.objects.get_or_create(username=username, defaults={'first_name': username})
+    client = Client()
+    client.force_login(user)
+    return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+
+def request(conn, method, url, ip, session=None, body=None, form=None):
+    csrf = 'x' * 32
+    headers = {'Host': HOST, 'X-Forwarded-For': ip, 'X-CSRFToken': csrf,
+               'Cookie': f'csrftoken={csrf}' + (f'; {settings.SESSION_COOKIE_NAME}={session}' if session else '')}
+    if body is not None:
+        headers['Content-Type'] = 'application/json'
+    elif form is not None:
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        body = form
+    conn.request(method, url, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def abuser(port, session, deadline, statuses, lock, n):
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    body = json.dumps(ORDER_BODY)
+    while time.monotonic() < deadline:
+        try:
+            if n % 2:
+                status = request(conn, 'POST', '/api/place-order/', ABUSER_IP, session, body=body)
+            else:
+                status = request(conn, 'POST', '/login/', ABUSER_IP, form=f'username=admin&password={get_random_string(12)}')
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(HOST, port, timeout=30)
+            status = 'error'
+        with lock:
+            statuses[status] += 1
+
+
+def customer(port, session, deadline, latencies, failures):
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    next_order = time.monotonic()
+    while time.monotonic() < deadline:
+        ordering = time.monotonic() >= next_order
+        t0 = time.perf_counter()
+        try:
+            if ordering:
+                next_order += 1
+                status = request(conn, 'POST', '/api/place-order/', CUSTOMER_IP, session,
+                                 body=json.dumps({'items': [{'title': 'Ema Datshi', 'qty': 1}]}))
+            else:
+                status = request(conn, 'GET', '/menu/', CUSTOMER_IP, session)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(HOST, port, timeout=30)
+            status = 'error'
+        latencies.append(time.perf_counter() - t0)
+        if status != 200:
+            failures[status] += 1
+        time.sleep(0.05)
+
+
+def run(args, limits):
+    env = dict(os.environ, SERVER_MODE=MODES[args.mode], RATELIMIT_ENABLED=str(limits), RATELIMIT_PROXY_COUNT='1')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--bind', f'{HOST}:{args.port}', '--workers', str(args.workers), '--log-level', 'error'],
+        cwd=project_root, env=env,
+        stderr=subprocess.DEVNULL,  # with DEBUG on, every 429 is logged
+    )
+    try:
+        wait_for_port(args.port)
+        abuser_session, customer_session = session_for('load_abuser'), session_for('load_customer')
+        deadline = time.monotonic() + args.duration
+        statuses, lock = Counter(), threading.Lock()
+        latencies, failures = [], Counter()
+        threads = [threading.Thread(target=abuser, args=(args.port, abuser_session, deadline, statuses, lock, n))
+                   for n in range(args.abusers)]
+        threads.append(threading.Thread(target=customer, args=(args.port, customer_session, deadline, latencies, failures)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {
+        'customer': {
+            'requests': len(latencies),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+            'mean_ms': round(statistics.fmean(latencies) * 1000, 1),
+            'failures': {str(k): v for k, v in failures.items()},
+        },
+        'abusers': {str(k): v for k, v in sorted(statuses.items(), key=str)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', default='gunicorn', choices=[m for m in MODES if MODES[m]])
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--abusers', type=int, default=32, help='Abusive connections.')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes.')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='Write the results here as JSON.')
+    args = parser.parse_args()
+
+    results = {}
+    for limits in (False, True):
+        label = 'limits on' if limits else 'limits off'
+        results[label] = run(args, limits)
+        c = results[label]['customer']
+        print(f'{label:10}  customer p50={c["p50_ms"]}ms p95={c["p95_ms"]}ms p99={c["p99_ms"]}ms '
+              f'requests={c["requests"]} failures={c["failures"]}  abusers={results[label]["abusers"]}')
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
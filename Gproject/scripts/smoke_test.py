@@ -88,7 +88,7 @@ test('POST /login/', test_login)
 
 # Test order API
 def test_place_order():
-    payload = {'items': [{'title': 'Test', 'price': 10, 'qty': 1}], 'total': 10}
+    payload = {'items': [{'title': 'Ema Datshi', 'price': 60, 'qty': 1}], 'total': 60}
     resp = client.post('/api/place-order/', json.dumps(payload), 
                        content_type='application/json', HTTP_X_REQUESTED_WITH='XMLHttpRequest', **HOST)
     assert resp.status_code == 200, f"Got {resp.status_code}"